@@ -0,0 +1,136 @@
+import os
+import hashlib
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models import AudioAsset, AudioBlob
+
+logger = logging.getLogger(__name__)
+
+# Rendered audio addressed by tts.render_key(); identical scripts+settings share one file
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR") or os.path.join(os.getenv("AUDIO_DIR", "/data/audio"), "blobs")
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(5 * 1024 * 1024 * 1024)))
+# A blob found or stored by synthesize is only referenced once finalize runs; until then the
+# recent last_used_at is what keeps it. Must comfortably exceed synthesize -> finalize.
+AUDIO_CACHE_GRACE_SECONDS = int(os.getenv("AUDIO_CACHE_GRACE_SECONDS", str(24 * 3600)))
+
+def blob_path(key: str, content_hash: str, output_format: str) -> str:
+    # the content hash in the name keeps files write-once: a path only ever holds one set of bytes
+    ext = output_format.split("_")[0]  # mp3_44100_128 -> mp3
+    return os.path.join(AUDIO_CACHE_DIR, key[:2], f"{key}-{content_hash[:16]}.{ext}")
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def lookup(db, key: str) -> AudioBlob | None:
+    """The stored rendering for `key`, if its file is still on disk."""
+    blob = db.get(AudioBlob, key)
+    if blob is None:
+        return None
+    if not os.path.exists(blob.file_path):
+        logger.warning("Audio blob %s is missing its file %s", key, blob.file_path)
+        return None
+    blob.last_used_at = datetime.utcnow()
+    return blob
+
+def store(db, key: str, src_path: str, duration_seconds: int, output_format: str) -> AudioBlob:
+    """
+    Moves a finished rendering into the cache (same filesystem) and records it. Blobs are
+    write-once: when `key` is already taken (a forced re-render), the new file is stored under
+    a key of its own, and the assets and HTTP caches holding the old one never see it change.
+    """
+    content_hash = file_sha256(src_path)
+    path = blob_path(key, content_hash, output_format)
+    now = datetime.utcnow()
+    blob_key = key
+    if db.get(AudioBlob, key) is not None:
+        blob_key = f"{key}-{content_hash[:16]}"
+    for blob in (db.get(AudioBlob, key), db.get(AudioBlob, blob_key)):
+        if blob is not None and blob.content_hash == content_hash:  # these exact bytes are stored already
+            os.remove(src_path)
+            blob.last_used_at = now
+            return blob
+
+    blob = AudioBlob(
+        key=blob_key,
+        file_path=path,
+        size_bytes=os.path.getsize(src_path),
+        content_hash=content_hash,
+        duration_seconds=duration_seconds,
+        refcount=0,
+        created_at=now,
+        last_used_at=now,
+    )
+    try:
+        with db.begin_nested():
+            db.add(blob)
+    except IntegrityError:
+        # another job stored this key first; ours becomes a forced-style sibling
+        return store(db, key, src_path, duration_seconds, output_format)
+    # the row only becomes visible on commit, by then the file is in place
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(src_path, path)
+    return blob
+
+def acquire(db, blob: AudioBlob) -> None:
+    """Call once per AudioAsset that points at `blob`."""
+    db.execute(
+        update(AudioBlob)
+        .where(AudioBlob.key == blob.key)
+        .values(refcount=AudioBlob.refcount + 1, last_used_at=datetime.utcnow())
+    )
+
+@event.listens_for(AudioAsset, "after_delete")
+def _release(mapper, connection, asset: AudioAsset) -> None:
+    # also fires for assets removed through the Article cascade
+    if asset.audio_key:
+        connection.execute(
+            update(AudioBlob)
+            .where(AudioBlob.key == asset.audio_key)
+            .values(refcount=AudioBlob.refcount - 1)
+        )
+
+def evict(db, max_bytes: int = AUDIO_CACHE_MAX_BYTES, grace_seconds: int = AUDIO_CACHE_GRACE_SECONDS) -> int:
+    """
+    Deletes unreferenced blobs, least recently used first, until the cache fits in max_bytes.
+    Blobs still referenced by an AudioAsset, or used within grace_seconds (a job between
+    synthesize and finalize), are never removed. Returns the bytes freed.
+    """
+    total = db.scalar(select(func.coalesce(func.sum(AudioBlob.size_bytes), 0)))
+    freed = 0
+    if total <= max_bytes:
+        return freed
+
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    evictable = (AudioBlob.refcount <= 0, AudioBlob.last_used_at < cutoff)
+    unused = db.execute(
+        select(AudioBlob.key, AudioBlob.file_path, AudioBlob.size_bytes)
+        .where(*evictable)
+        .order_by(AudioBlob.last_used_at)
+    ).all()
+    doomed = []
+    for key, path, size in unused:
+        if total - freed <= max_bytes:
+            break
+        # conditions re-checked in the DELETE: another job may have taken the blob since the SELECT
+        if db.execute(delete(AudioBlob).where(AudioBlob.key == key, *evictable)).rowcount:
+            doomed.append((key, path))
+            freed += size
+    db.commit()
+
+    # rows first, files second: a file is only removed once nothing can find it any more
+    for key, path in doomed:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.warning("Could not remove evicted audio blob %s at %s", key, path, exc_info=True)
+    return freed
@@ -0,0 +1,123 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any
+
+class DiskCache:
+    """
+    Small content store on the local filesystem, safe to share between worker processes.
+    One file per key; mtime is the write time (TTL), atime is bumped on every hit (LRU).
+    Any OSError is treated as a miss: the cache must never break the pipeline.
+    """
+
+    def __init__(self, root: str, ttl_seconds: int, max_bytes: int, evict_every: int = 100):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self._puts = 0
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], digest)
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            st = os.stat(path)
+            if time.time() - st.st_mtime > self.ttl_seconds:
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path, (time.time(), st.st_mtime))
+            return data
+        except OSError:
+            return None
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write then rename so readers never see a partial file
+            with tempfile.NamedTemporaryFile(delete=False, dir=os.path.dirname(path), suffix=".tmp") as tmp:
+                tmp.write(data)
+            os.replace(tmp.name, path)
+        except OSError:
+            return
+
+        self._puts += 1
+        if self._puts % self.evict_every == 0:
+            self.evict()
+
+    def evict(self) -> None:
+        """Drop expired entries, then least recently used ones until under max_bytes."""
+        now = time.time()
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                    if name.endswith(".tmp") or now - st.st_mtime > self.ttl_seconds:
+                        # stale temp files are left behind by killed workers
+                        if not name.endswith(".tmp") or now - st.st_mtime > 3600:
+                            os.remove(path)
+                        continue
+                except OSError:
+                    continue
+                entries.append((st.st_atime, st.st_size, path))
+                total += st.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+class LRUCache:
+    """Thread-safe in-process LRU with an optional TTL per entry."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float | None = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            stored_at, value = item
+            if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Any) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
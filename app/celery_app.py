@@ -0,0 +1,71 @@
+import os
+import time
+import uuid
+
+from celery import Celery, Signature, chain, chord
+
+# Kept free of pipeline imports: the API only sends tasks by name, the worker loads app.tasks
+celery_app = Celery(
+    "mvp",
+    broker=os.environ["CELERY_BROKER_URL"],
+    backend=os.environ["CELERY_RESULT_BACKEND"],
+    include=["app.tasks"],
+)
+celery_app.conf.update(
+    result_extended=True,     # keep task name/kwargs in the result, so batch status can label items
+    task_track_started=True,  # STARTED instead of PENDING while a worker is on it
+    # one queue per kind of work, so each pool can be sized for it:
+    #   celery -A app.celery_app worker -Q tts --concurrency 8
+    task_routes={
+        "stage_fetch": {"queue": "feeds"},
+        "stage_extract": {"queue": "extract"},
+        "stage_summarize": {"queue": "llm"},
+        "stage_storyboard": {"queue": "llm"},
+        "stage_synthesize": {"queue": "tts"},
+        "stage_restoryboard": {"queue": "llm"},  # only calls the LLM when TTS rewrote the script
+        "stage_finalize": {"queue": "celery"},
+    },
+)
+
+TARGET_SECONDS = int(os.getenv("TTS_TARGET_SECONDS", "180"))
+
+def initial_state(
+    job_id: str | None, source_id: str, voice_id: str | None, target_seconds: int, n_scenes: int, force: bool,
+) -> dict:
+    return {
+        "job_id": job_id,
+        "source_id": source_id,
+        "voice_id": voice_id,
+        "target_seconds": target_seconds,
+        "n_scenes": n_scenes,
+        "force": force,
+        "queued_at": time.time(),  # PipelineRun wall time counts from here
+    }
+
+def generate_pipeline(
+    source_id: str,
+    voice_id: str | None = None,
+    target_seconds: int = TARGET_SECONDS,
+    n_scenes: int = 8,
+    force: bool = False,
+) -> tuple[Signature, str]:
+    """
+    Staged generate_latest_for_source: fetch -> extract -> summarize -> (storyboard | synthesize)
+    -> restoryboard -> finalize, each on its own queue; restoryboard redoes the scenes only if TTS
+    rewrote the script. Returns the workflow and the job id, which is the final task's id.
+    """
+    job_id = str(uuid.uuid4())
+    state = initial_state(job_id, source_id, voice_id, target_seconds, n_scenes, force)
+    workflow = chain(
+        celery_app.signature("stage_fetch", args=(state,)),
+        celery_app.signature("stage_extract"),
+        celery_app.signature("stage_summarize"),
+        chord(
+            [celery_app.signature("stage_storyboard"), celery_app.signature("stage_synthesize")],
+            chain(
+                celery_app.signature("stage_restoryboard"),
+                celery_app.signature("stage_finalize").set(task_id=job_id),
+            ),
+        ),
+    )
+    return workflow, job_id
@@ -0,0 +1,238 @@
+import os
+import re
+import sys
+import json
+import argparse
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.length_fit import count_words
+from app.models import Article, AudioAsset, DurationModel
+
+DURATION_RLS_FORGETTING = float(os.getenv("DURATION_RLS_FORGETTING", "0.995"))  # <1 follows voice drift
+DURATION_MIN_SAMPLES = int(os.getenv("DURATION_MIN_SAMPLES", "5"))  # trust the model from here on
+BASELINE_WPM = 140.0  # Spanish baseline, same as the calibration default
+
+# same knob as tasks.CAL_ALPHA; only used to replay the EMA baseline in `evaluate`
+_EMA_ALPHA = float(os.getenv("TTS_CAL_ALPHA", "0.3"))
+
+_SENTENCE_END_RE = re.compile(r"[.!?…]+(?=\s|$)")
+_NUMERAL_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+FEATURES = ("bias", "words", "chars", "sentences", "commas", "numerals")
+# keeps RLS well conditioned: every feature is ~1-10 for a 3 minute script
+_SCALE = (1.0, 100.0, 1000.0, 10.0, 10.0, 10.0)
+
+def features(script: str) -> list[float]:
+    raw = (
+        1.0,
+        count_words(script),
+        len(script),
+        len(_SENTENCE_END_RE.findall(script)) or 1,
+        script.count(","),
+        len(_NUMERAL_RE.findall(script)),  # read out as several words each
+    )
+    return [v / s for v, s in zip(raw, _SCALE)]
+
+def language_key(language: str | None) -> str:
+    # language enters as a partition: each voice gets separate coefficients per language
+    return (language or "es").split("-")[0].lower()
+
+@dataclass
+class Estimator:
+    """Linear model seconds = coef . features(script), fitted online by recursive least squares."""
+    coef: list[float]
+    cov: list[list[float]]
+    samples: int = 0
+
+    @classmethod
+    def prior(cls, wpm: float = BASELINE_WPM) -> "Estimator":
+        coef = [0.0] * len(FEATURES)
+        coef[1] = 100 * 60.0 / wpm  # seconds per 100 words
+        # loose around the word-rate prior: a handful of samples is enough to move it
+        variances = (100.0, 25.0, 25.0, 25.0, 25.0, 25.0)
+        cov = [[variances[i] if i == j else 0.0 for j in range(len(FEATURES))] for i in range(len(FEATURES))]
+        return cls(coef, cov)
+
+    def predict(self, script: str) -> float:
+        return max(0.0, sum(c * x for c, x in zip(self.coef, features(script))))
+
+    def update(self, script: str, seconds: float, forgetting: float = DURATION_RLS_FORGETTING) -> None:
+        x = features(script)
+        n = len(x)
+        px = [sum(self.cov[i][j] * x[j] for j in range(n)) for i in range(n)]
+        gain_den = forgetting + sum(x[i] * px[i] for i in range(n))
+        gain = [v / gain_den for v in px]
+        err = seconds - sum(c * v for c, v in zip(self.coef, x))
+
+        self.coef = [c + g * err for c, g in zip(self.coef, gain)]
+        # P is symmetric, so x'P == (Px)'
+        self.cov = [
+            [(self.cov[i][j] - gain[i] * px[j]) / forgetting for j in range(n)]
+            for i in range(n)
+        ]
+        self.samples += 1
+
+def _row(db, voice_id: str, model_id: str, speed: float, language: str | None) -> DurationModel | None:
+    return db.get(DurationModel, (voice_id, model_id, speed, language_key(language)))
+
+def load_estimator(
+    db, voice_id: str, model_id: str, speed: float, language: str | None, wpm: float = BASELINE_WPM,
+) -> Estimator:
+    """Stored model for this voice, or the word-rate prior if it has never been observed."""
+    row = _row(db, voice_id, model_id, speed, language)
+    if row is None:
+        return Estimator.prior(wpm)
+    return Estimator(list(row.coef), [list(r) for r in row.cov], row.samples)
+
+def predict_seconds(
+    db, script: str, voice_id: str, model_id: str, speed: float = 1.0,
+    language: str | None = None, wpm: float = BASELINE_WPM,
+) -> float:
+    """Expected audio length of `script` before paying for it."""
+    return load_estimator(db, voice_id, model_id, speed, language, wpm).predict(script)
+
+def _locked_row(
+    db, voice_id: str, model_id: str, speed: float, language: str | None, wpm: float,
+) -> DurationModel:
+    """The voice's model row, locked until the caller commits; created from the prior if missing."""
+    q = (
+        select(DurationModel)
+        .where(
+            DurationModel.voice_id == voice_id,
+            DurationModel.model_id == model_id,
+            DurationModel.speed == speed,
+            DurationModel.language == language_key(language),
+        )
+        .with_for_update()
+        .execution_options(populate_existing=True)  # the identity map may hold a stale copy
+    )
+    row = db.scalar(q)
+    if row is None:
+        prior = Estimator.prior(wpm)
+        try:
+            with db.begin_nested():
+                db.add(DurationModel(
+                    voice_id=voice_id, model_id=model_id, speed=speed, language=language_key(language),
+                    coef=prior.coef, cov=prior.cov, samples=0, updated_at=datetime.utcnow(),
+                ))
+        except IntegrityError:
+            pass  # another worker created it first; lock theirs
+        row = db.scalar(q)
+    return row
+
+def record_duration(
+    db, script: str, seconds: float, voice_id: str, model_id: str, speed: float,
+    language: str | None, wpm: float = BASELINE_WPM,
+) -> Estimator:
+    """
+    Folds one measured rendering into the voice's model and returns it. The caller commits.
+    The row stays locked (SELECT ... FOR UPDATE) until then, so concurrent workers queue
+    up instead of overwriting each other's update.
+    """
+    row = _locked_row(db, voice_id, model_id, speed, language, wpm)
+    est = Estimator(list(row.coef), [list(r) for r in row.cov], row.samples)
+    est.update(script, seconds)
+
+    row.coef = est.coef
+    row.cov = est.cov
+    row.samples = est.samples
+    row.updated_at = datetime.utcnow()
+    return est
+
+def _history(db, voice_id: str | None = None):
+    """(asset, script, language) for every ready asset whose voiced text is known, oldest first."""
+    q = (
+        select(AudioAsset, Article.tts_script, Article.script_language)
+        .join(Article, Article.id == AudioAsset.article_id)
+        .where(AudioAsset.status == "ready", AudioAsset.estimated_seconds.is_not(None))
+        .order_by(AudioAsset.created_at)
+    )
+    if voice_id:
+        q = q.where(AudioAsset.voice_id == voice_id)
+    for asset, article_script, language in db.execute(q):
+        script = asset.script_text
+        # older rows: the article's script is only trustworthy if it is the one that was voiced
+        if not script and article_script and count_words(article_script) == asset.word_count:
+            script = article_script
+        if script:
+            yield asset, script, language
+
+def _errors_summary(errors: list[tuple[float, float]], tolerance: float) -> dict:
+    if not errors:
+        return {"n": 0}
+    abs_err = [abs(p - y) for p, y in errors]
+    return {
+        "n": len(errors),
+        "mae_seconds": round(sum(abs_err) / len(errors), 2),
+        "mape": round(sum(e / max(y, 1.0) for e, (_, y) in zip(abs_err, errors)) / len(errors), 4),
+        "within_tolerance": round(sum(e <= tolerance for e in abs_err) / len(errors), 4),
+    }
+
+def evaluate(db, voice_id: str | None = None, tolerance: float = 30.0, speed: float = 1.0) -> dict:
+    """
+    Prequential replay of past renderings: each one is predicted before it is learned from,
+    by both the RLS model and the old EMA words-per-minute calibration.
+    """
+    models: dict[tuple, Estimator] = {}
+    wpm: dict[tuple, float] = {}
+    rls: list[tuple[float, float]] = []
+    ema: list[tuple[float, float]] = []
+
+    for asset, script, language in _history(db, voice_id):
+        seconds = float(asset.estimated_seconds)
+        key = (asset.voice_id, asset.model_id, speed, language_key(language))
+        est = models.setdefault(key, Estimator.prior())
+        rls.append((est.predict(script), seconds))
+        est.update(script, seconds)
+
+        words = count_words(script)
+        rate = wpm.get(key[:3])
+        ema.append((words / (rate or BASELINE_WPM) * 60.0, seconds))
+        observed = words / max(seconds, 1.0) * 60.0
+        wpm[key[:3]] = observed if rate is None else (1 - _EMA_ALPHA) * rate + _EMA_ALPHA * observed
+
+    return {
+        "tolerance_seconds": tolerance,
+        "rls": _errors_summary(rls, tolerance),
+        "ema_wpm": _errors_summary(ema, tolerance),
+    }
+
+def fit(db, voice_id: str | None = None, speed: float = 1.0) -> int:
+    """Rebuilds the stored models from past renderings. Returns the number of samples used."""
+    q = db.query(DurationModel)
+    if voice_id:
+        q = q.filter(DurationModel.voice_id == voice_id)
+    q.delete()
+
+    n = 0
+    for asset, script, language in list(_history(db, voice_id)):
+        record_duration(db, script, float(asset.estimated_seconds), asset.voice_id, asset.model_id, speed, language)
+        db.flush()
+        n += 1
+    db.commit()
+    return n
+
+def main(argv: list[str] | None = None) -> None:
+    from app.db import SessionLocal
+
+    parser = argparse.ArgumentParser(prog="python -m app.duration", description="TTS duration predictor")
+    parser.add_argument("command", choices=("evaluate", "fit"))
+    parser.add_argument("--voice", help="only this voice_id")
+    parser.add_argument("--tolerance", type=float, default=float(os.getenv("TTS_TOLERANCE_SECONDS", "30")))
+    parser.add_argument("--speed", type=float, default=float(os.getenv("ELEVENLABS_SPEED", "1.0")),
+                        help="speed the history was rendered at (not stored per asset)")
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        if args.command == "evaluate":
+            json.dump(evaluate(db, args.voice, args.tolerance, args.speed), sys.stdout, indent=2)
+            sys.stdout.write("\n")
+        else:
+            print(f"fitted from {fit(db, args.voice, args.speed)} renderings")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import os
+import json
+import time
+import logging
+from collections.abc import AsyncIterator
+
+logger = logging.getLogger(__name__)
+
+# Job progress events: a replay list per job plus a pub/sub channel for live delivery
+EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL") or os.getenv("CELERY_RESULT_BACKEND", "")
+EVENTS_TTL_SECONDS = int(os.getenv("EVENTS_TTL_SECONDS", str(24 * 3600)))
+
+TERMINAL_EVENTS = ("done", "failed")
+
+_redis = None
+
+def enabled() -> bool:
+    return EVENTS_REDIS_URL.startswith(("redis://", "rediss://"))
+
+def _key(job_id: str) -> str:
+    return f"job-events:{job_id}"
+
+def _client():
+    global _redis
+    if _redis is None:
+        import redis
+
+        _redis = redis.Redis.from_url(EVENTS_REDIS_URL)
+    return _redis
+
+def publish(job_id: str | None, event: str, **data) -> None:
+    """Records one event for `job_id`. Never raises: progress reporting must not fail a job."""
+    if not job_id or not enabled():
+        return
+    payload = {"event": event, "ts": time.time(), **data}
+    try:
+        r = _client()
+        key = _key(job_id)
+        with r.pipeline() as pipe:
+            pipe.rpush(key, json.dumps(payload))
+            pipe.expire(key, EVENTS_TTL_SECONDS)
+            seq, _ = pipe.execute()
+        # live subscribers dedupe against the replay by seq (1-based list position)
+        r.publish(key, json.dumps({**payload, "seq": seq}))
+    except Exception:
+        logger.warning("Could not publish %s event for job %s", event, job_id, exc_info=True)
+
+async def stream(job_id: str, after_seq: int = 0, heartbeat_seconds: float = 15.0) -> AsyncIterator[dict | None]:
+    """
+    Every event of a job, oldest first, then live ones until a terminal event.
+    Yields None every `heartbeat_seconds` without news so callers can keep the connection alive.
+    """
+    import redis.asyncio
+
+    r = redis.asyncio.Redis.from_url(EVENTS_REDIS_URL)
+    pubsub = r.pubsub()
+    key = _key(job_id)
+    try:
+        # subscribe before replaying so nothing published in between is lost
+        await pubsub.subscribe(key)
+        last = after_seq
+        for i, raw in enumerate(await r.lrange(key, after_seq, -1), start=after_seq + 1):
+            event = {**json.loads(raw), "seq": i}
+            last = i
+            yield event
+            if event["event"] in TERMINAL_EVENTS:
+                return
+
+        while True:
+            msg = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat_seconds)
+            if msg is None:
+                yield None
+                continue
+            event = json.loads(msg["data"])
+            if event["seq"] <= last:
+                continue
+            last = event["seq"]
+            yield event
+            if event["event"] in TERMINAL_EVENTS:
+                return
+    finally:
+        try:
+            await pubsub.unsubscribe(key)
+            await pubsub.aclose()
+            await r.aclose()
+        except Exception:
+            pass
@@ -1,12 +1,115 @@
+import os
 import re
+import json
+import logging
+import time
+import hashlib
+import threading
+import multiprocessing
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
 import httpx
 import trafilatura
 
+from app import runs
+from app.cache import DiskCache
+from app.metrics import EXTRACT_SECONDS, cache_lookup, timer
+
+logger = logging.getLogger(__name__)
+
 HEADERS = {"User-Agent": "mvp-med-audio/0.1 (+https://example.local)"}
 
 _MIN_WORDS = 120   # below this, extraction likely failed (tweak)
 _MAX_CHARS = 20000 # cap so you don’t feed huge junk to the summarizer
 
+FETCH_TIMEOUT_SECONDS = float(os.getenv("EXTRACT_TIMEOUT_SECONDS", "20"))
+FETCH_MAX_CONNECTIONS = int(os.getenv("EXTRACT_MAX_CONNECTIONS", "20"))
+FETCH_MAX_BYTES = int(os.getenv("EXTRACT_MAX_BYTES", str(2 * 1024 * 1024)))  # stop reading past this
+
+# Raw HTML + extracted text, shared by retries, re-voicings and duplicate links ("" disables)
+EXTRACT_CACHE_DIR = os.getenv("EXTRACT_CACHE_DIR", "/data/cache/extract")
+EXTRACT_CACHE_TTL_SECONDS = int(os.getenv("EXTRACT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+EXTRACT_CACHE_MAX_BYTES = int(os.getenv("EXTRACT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Tracking params that don't change the page
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+
+# Anything else (PDF, images, video, zip...) is never downloaded
+_HTML_TYPES = ("text/html", "application/xhtml+xml", "text/plain", "text/xml", "application/xml")
+EXTRACT_FETCH_CONCURRENCY = int(os.getenv("EXTRACT_FETCH_CONCURRENCY", "16"))
+EXTRACT_PROCESSES = int(os.getenv("EXTRACT_PROCESSES", "0")) or os.cpu_count() or 1
+# inside a Celery prefork child: every child may run a batch, so keep each one's pool small
+EXTRACT_WORKER_PROCESSES = int(os.getenv("EXTRACT_WORKER_PROCESSES", "2"))
+
+_http_client: httpx.Client | None = None
+_http_client_pid: int | None = None
+_init_lock = threading.Lock()
+
+_parse_pool: Executor | None = None
+_parse_pool_pid: int | None = None
+
+_cache = (
+    DiskCache(EXTRACT_CACHE_DIR, EXTRACT_CACHE_TTL_SECONDS, EXTRACT_CACHE_MAX_BYTES)
+    if EXTRACT_CACHE_DIR else None
+)
+
+@dataclass
+class Page:
+    url: str  # final URL after redirects
+    content_type: str
+    content: bytes
+    truncated: bool = False  # body was cut at the byte budget
+
+def _http() -> httpx.Client:
+    """
+    One keep-alive client per process, shared by every task in a worker.
+    Re-created after fork so Celery prefork children never share the parent's sockets.
+    """
+    global _http_client, _http_client_pid
+    with _init_lock:
+        if _http_client is None or _http_client_pid != os.getpid():
+            _http_client = httpx.Client(
+                headers=HEADERS,
+                timeout=FETCH_TIMEOUT_SECONDS,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=FETCH_MAX_CONNECTIONS,
+                    max_keepalive_connections=FETCH_MAX_CONNECTIONS,
+                ),
+            )
+            _http_client_pid = os.getpid()
+        return _http_client
+
+def _is_html(content_type: str) -> bool:
+    # servers that send no content-type at all are usually serving HTML
+    return not content_type or content_type.split(";")[0].strip() in _HTML_TYPES
+
+def fetch_page(url: str, max_bytes: int = FETCH_MAX_BYTES) -> Page | None:
+    """
+    Streams the response: decides on the headers alone, then reads at most `max_bytes`.
+    Returns None for non-HTML responses (PDFs etc.) without reading their body.
+    """
+    with _http().stream("GET", url) as r:
+        r.raise_for_status()
+        ctype = (r.headers.get("content-type") or "").lower()
+        if not _is_html(ctype):
+            return None
+
+        buf = bytearray()
+        truncated = False
+        for chunk in r.iter_bytes():
+            buf += chunk
+            if len(buf) >= max_bytes:
+                truncated = True
+                del buf[max_bytes:]
+                break  # leaving the block closes the connection mid-body
+
+    return Page(url=str(r.url), content_type=ctype, content=bytes(buf), truncated=truncated)
+
 def _clean(text: str) -> str:
     text = re.sub(r"\n{3,}", "\n\n", text)
     text = re.sub(r"[ \t]{2,}", " ", text)
@@ -18,49 +121,229 @@ def _good_enough(text: str) -> bool:
     words = len(text.split())
     return words >= _MIN_WORDS
 
-def extract_article_text(url: str, fallback_text: str | None = None) -> str:
-    # 1) First: trafilatura direct fetch (fast path)
+def _extract(html: bytes, url: str, **opts) -> str:
+    text = trafilatura.extract(
+        html,
+        url=url,
+        include_comments=False,
+        include_tables=False,
+        **opts,
+    )
+    return _clean(text)[:_MAX_CHARS] if text else ""
+
+def _extract_best(html: bytes, url: str) -> tuple[str, str]:
+    """
+    (text, "precision") when the precision-first pass is good enough, else ("", "fallback").
+    The second value labels extract_seconds{path}. Picklable for the pool.
+    """
     try:
-        downloaded = trafilatura.fetch_url(url)
-        if downloaded:
-            text = trafilatura.extract(
-                downloaded,
-                url=url,
-                include_comments=False,
-                include_tables=False,
-                favor_precision=True,
-            )
-            if text:
-                text = _clean(text)[:_MAX_CHARS]
-                if _good_enough(text):
-                    return text
+        text = _extract(html, url, favor_precision=True)
     except Exception:
-        pass
+        return "", "fallback"
+    return (text, "precision") if _good_enough(text) else ("", "fallback")
 
-    # 2) Second: manual fetch with content-type detection
+def _fetch_quietly(url: str) -> tuple[Page | None, bool]:
+    """(page, ok): ok is False on network/HTTP errors, which must not be cached."""
     try:
-        with httpx.Client(headers=HEADERS, timeout=20.0, follow_redirects=True) as client:
-            r = client.get(url)
-            r.raise_for_status()
-            ctype = (r.headers.get("content-type") or "").lower()
-
-            # PDFs or other non-HTML: fallback to RSS summary for now
-            if "application/pdf" in ctype:
-                return _clean(fallback_text or "")
-
-            text = trafilatura.extract(
-                r.text,
-                url=str(r.url),
-                include_comments=False,
-                include_tables=False,
-                favor_precision=True,
-            )
-            if text:
-                text = _clean(text)[:_MAX_CHARS]
-                if _good_enough(text):
-                    return text
+        return fetch_page(url), True
     except Exception:
-        pass
+        return None, False
+
+class _BilliardExecutor(Executor):
+    """
+    concurrent.futures face on billiard.Pool (ships with Celery). Unlike multiprocessing,
+    billiard may start children from a daemonic process such as a Celery prefork worker.
+    """
+
+    def __init__(self, processes: int):
+        from billiard.pool import Pool
+
+        self._pool = Pool(processes)
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        fut: Future = Future()
+        fut.set_running_or_notify_cancel()
+        self._pool.apply_async(
+            fn, args, kwargs,
+            callback=fut.set_result,
+            error_callback=lambda einfo: fut.set_exception(einfo.exception),  # billiard wraps it in ExceptionInfo
+        )
+        return fut
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self._pool.close()
+        if wait:
+            self._pool.join()
+
+def _daemon_pool() -> Executor:
+    try:
+        pool = _BilliardExecutor(EXTRACT_WORKER_PROCESSES)
+    except Exception:
+        logger.warning(
+            "Could not start a billiard pool in daemonic process %s; parsing on threads (one core)",
+            os.getpid(), exc_info=True,
+        )
+        return ThreadPoolExecutor(max_workers=EXTRACT_WORKER_PROCESSES)
+    logger.info("Parsing on a billiard pool of %d processes", EXTRACT_WORKER_PROCESSES)
+    return pool
+
+def _pool() -> Executor:
+    """Process pool for the CPU-bound trafilatura work, one per (non-worker) process, kept for its lifetime."""
+    global _parse_pool, _parse_pool_pid
+    with _init_lock:
+        if _parse_pool is None or _parse_pool_pid != os.getpid():
+            # spawn: forking a process that already runs threads is unsafe
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=EXTRACT_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _parse_pool_pid = os.getpid()
+        return _parse_pool
+
+@contextmanager
+def _batch_pool() -> Iterator[Executor]:
+    """
+    Celery prefork children are daemonic and multiprocessing refuses to give them children,
+    so there the pool comes from billiard, has EXTRACT_WORKER_PROCESSES processes and only lives
+    for one batch: idle parsers must not sit next to the TTS/LLM children. Threads are only a
+    logged last resort. Everywhere else the process-wide pool is reused.
+    """
+    if not multiprocessing.current_process().daemon:
+        yield _pool()
+        return
+    pool = _daemon_pool()
+    try:
+        yield pool
+    finally:
+        pool.shutdown()
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(_TRACKING_PARAMS)
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+def _cached_text(url: str) -> str | None:
+    """
+    Extraction result from the cache, without network I/O.
+    "" means we know the page has no usable text (non-HTML, too short); None means unknown.
+    """
+    if _cache is None:
+        return None
+    entry = _cache.get("url:" + normalize_url(url))
+    if entry is None:
+        return None
+    content_hash = json.loads(entry).get("content_hash")
+    if content_hash is None:
+        return ""
+
+    text = _cache.get("text:" + content_hash)
+    if text is not None:
+        return text.decode("utf-8")
+
+    # text evicted or never stored, but the page is still here
+    html = _cache.get("html:" + content_hash)
+    if html is None:
+        return None
+    text, _ = _extract_best(html, url)
+    _cache.put("text:" + content_hash, text.encode("utf-8"))
+    return text
+
+def _remember_page(url: str, page: Page | None) -> str | None:
+    """Stores the downloaded page; returns its content hash."""
+    if _cache is None:
+        return None
+    content_hash = hashlib.sha256(page.content).hexdigest() if page else None
+    if page:
+        _cache.put("html:" + content_hash, page.content)
+    _cache.put("url:" + normalize_url(url), json.dumps({"content_hash": content_hash}).encode("utf-8"))
+    return content_hash
+
+def _remember_text(content_hash: str | None, text: str) -> None:
+    if _cache is not None and content_hash:
+        _cache.put("text:" + content_hash, text.encode("utf-8"))
+
+def extract_article_text(url: str, fallback_text: str | None = None, refresh: bool = False) -> str:
+    """refresh (forced regeneration) downloads and parses again, then overwrites the cached entries."""
+    with timer(EXTRACT_SECONDS, path="fallback") as labels:
+        try:
+            return _extract_article_text(url, fallback_text, labels, refresh)
+        finally:
+            runs.note(extract_path=labels["path"])
+
+def _extract_article_text(url: str, fallback_text: str | None, labels: dict, refresh: bool) -> str:
+    """extract_article_text; sets labels["path"] to the path that produced the text."""
+    # 0) Same page already fetched/extracted by a previous task
+    if not refresh:
+        text = _cached_text(url)
+        cache_lookup("extract", text is not None)
+        if text is not None:
+            labels["path"] = "cache"
+            return text or _clean(fallback_text or "")
+
+    # 1) Download once over the shared client
+    # PDFs or other non-HTML come back as None: fallback to RSS summary for now
+    page, ok = _fetch_quietly(url)
+    content_hash = _remember_page(url, page) if ok else None
+
+    # 2) Extract from the downloaded bytes
+    if page:
+        text, labels["path"] = _extract_best(page.content, page.url)
+        _remember_text(content_hash, text)
+        if text:
+            return text
 
     # 3) Final fallback
     return _clean(fallback_text or "")
+
+def extract_many(urls_with_fallbacks: Iterable[tuple[str, str | None]]) -> Iterator[tuple[str, str]]:
+    """
+    Batch version of extract_article_text.
+    Downloads concurrently, parses on a process pool (see _batch_pool),
+    and yields (url, text) in completion order, not input order.
+    """
+    fallbacks = dict(urls_with_fallbacks)
+
+    to_fetch = []
+    for url, fallback in fallbacks.items():
+        started = time.perf_counter()
+        text = _cached_text(url)
+        cache_lookup("extract", text is not None)
+        if text is None:
+            to_fetch.append(url)
+        else:
+            EXTRACT_SECONDS.labels("cache").observe(time.perf_counter() - started)
+            yield url, text or _clean(fallback or "")
+
+    if not to_fetch:
+        return
+    with _batch_pool() as pool, ThreadPoolExecutor(max_workers=EXTRACT_FETCH_CONCURRENCY) as fetchers:
+        started = time.perf_counter()
+        pending = {fetchers.submit(_fetch_quietly, url): (url, "fetch", None) for url in to_fetch}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                url, stage, content_hash = pending.pop(fut)
+                text, path = "", "fallback"
+                if stage == "fetch":
+                    page, ok = fut.result()
+                    content_hash = _remember_page(url, page) if ok else None
+                    if page:
+                        parse = pool.submit(_extract_best, page.content, page.url)
+                        pending[parse] = (url, "parse", content_hash)
+                        continue
+                else:
+                    try:
+                        text, path = fut.result()
+                        _remember_text(content_hash, text)
+                    except Exception:
+                        pass
+                # time since the batch started: what this article actually waited
+                EXTRACT_SECONDS.labels(path).observe(time.perf_counter() - started)
+                yield url, text or _clean(fallbacks[url] or "")
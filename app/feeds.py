@@ -0,0 +1,109 @@
+import asyncio
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.extract import HEADERS
+from app.metrics import FEED_FETCH_SECONDS
+
+FEED_TIMEOUT_SECONDS = float(os.getenv("FEED_TIMEOUT_SECONDS", "20"))
+FEED_MAX_CONNECTIONS = int(os.getenv("FEED_MAX_CONNECTIONS", "50"))
+FEED_MAX_PER_HOST = int(os.getenv("FEED_MAX_PER_HOST", "4"))  # FDA/NIH host many feeds each
+
+@dataclass
+class FeedSource:
+    source_id: str
+    url: str
+    # validators from the previous poll (all optional)
+    etag: str | None = None
+    last_modified: str | None = None
+    content_hash: str | None = None
+
+@dataclass
+class FeedFetch:
+    source_id: str
+    url: str
+    status_code: int | None = None
+    content: bytes | None = None
+    content_type: str | None = None
+    etag: str | None = None
+    last_modified: str | None = None
+    content_hash: str | None = None
+    not_modified: bool = False  # 304 or same body as last time: nothing to parse
+    elapsed_ms: int = 0
+    error: str | None = None
+
+async def _fetch_one(
+    client: httpx.AsyncClient,
+    host_slots: dict[str, asyncio.Semaphore],
+    feed: FeedSource,
+) -> FeedFetch:
+    out = FeedFetch(
+        source_id=feed.source_id,
+        url=feed.url,
+        etag=feed.etag,
+        last_modified=feed.last_modified,
+        content_hash=feed.content_hash,
+    )
+    headers = {}
+    if feed.etag:
+        headers["If-None-Match"] = feed.etag
+    if feed.last_modified:
+        headers["If-Modified-Since"] = feed.last_modified
+
+    host = urlsplit(feed.url).netloc.lower()
+    slot = host_slots.setdefault(host, asyncio.Semaphore(FEED_MAX_PER_HOST))
+
+    async with slot:
+        started = time.perf_counter()
+        try:
+            r = await client.get(feed.url, headers=headers)
+            out.status_code = r.status_code
+            if r.status_code == 304:
+                out.not_modified = True
+            elif r.is_error:
+                out.error = f"HTTP {r.status_code}"
+            else:
+                out.etag = r.headers.get("etag")
+                out.last_modified = r.headers.get("last-modified")
+                out.content_hash = hashlib.sha256(r.content).hexdigest()
+                if feed.content_hash and out.content_hash == feed.content_hash:
+                    # server ignores validators but the body is identical
+                    out.not_modified = True
+                else:
+                    out.content = r.content
+                    out.content_type = r.headers.get("content-type")
+        except Exception as e:
+            out.error = f"{type(e).__name__}: {e}"
+        finally:
+            elapsed = time.perf_counter() - started
+            out.elapsed_ms = int(elapsed * 1000)
+            outcome = "error" if out.error else "not_modified" if out.not_modified else "ok"
+            FEED_FETCH_SECONDS.labels(outcome).observe(elapsed)
+    return out
+
+async def fetch_feeds(feeds: list[FeedSource]) -> list[FeedFetch]:
+    """
+    Fetch feeds concurrently over one pooled client, sending conditional-GET validators.
+    Never raises for a single feed; failures are reported on the FeedFetch.
+    """
+    limits = httpx.Limits(
+        max_connections=FEED_MAX_CONNECTIONS,
+        max_keepalive_connections=FEED_MAX_CONNECTIONS,
+    )
+    host_slots: dict[str, asyncio.Semaphore] = {}
+    async with httpx.AsyncClient(
+        headers=HEADERS,
+        timeout=FEED_TIMEOUT_SECONDS,
+        follow_redirects=True,
+        limits=limits,
+    ) as client:
+        return await asyncio.gather(*(_fetch_one(client, host_slots, f) for f in feeds))
+
+def fetch_all(feeds: list[FeedSource]) -> list[FeedFetch]:
+    """Sync entry point for Celery tasks."""
+    return asyncio.run(fetch_feeds(feeds))
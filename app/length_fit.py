@@ -0,0 +1,76 @@
+import re
+
+_WORD_RE = re.compile(r"[A-Za-zÀ-ÖØ-öø-ÿ0-9]+(?:'[A-Za-z]+)?")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?…])\s+")
+_NUMBER_RE = re.compile(r"\d")
+
+# Common INN stems (-mab, -nib, -vir, ...) as a cheap drug-name detector
+_DRUG_RE = re.compile(
+    r"\b\w+(?:mab|nib|vir|pril|sartan|olol|statin|cillin|mycin|cycline|azole|prazole|dipine|"
+    r"gliptin|glutide|flozin|parin|oxacin|afil|lukast|triptan|azepam|caine|profen|setron|"
+    r"tinib|zumab|ximab|umab|platin|taxel|rubicin|limus|tidine|dronate)\b",
+    re.IGNORECASE,
+)
+_DISCLAIMER_RE = re.compile(
+    r"consejo m[eé]dico|asesor[ií]a m[eé]dica|no sustituye|no reemplaza|profesional(?:es)? de la salud|"
+    r"consulte|consulta a|medical advice|healthcare professional",
+    re.IGNORECASE,
+)
+
+def count_words(text: str) -> int:
+    return len(_WORD_RE.findall(text))
+
+def _split_sentences(text: str) -> list[str]:
+    return [s.strip() for s in _SENTENCE_SPLIT_RE.split(text.strip()) if s.strip()]
+
+def _protected(sentence: str) -> bool:
+    return bool(_NUMBER_RE.search(sentence) or _DRUG_RE.search(sentence))
+
+def _entities(sentence: str) -> int:
+    # capitalized words after the first one: agencies, places, brand names
+    return sum(1 for w in sentence.split()[1:] if w[:1].isupper())
+
+def shorten_to_range(script: str, min_words: int, max_words: int) -> str | None:
+    """
+    Local, deterministic alternative to an LLM "shorten" rewrite: drops whole sentences,
+    least important first, until min_words <= words <= max_words.
+    The opening sentence, the closing disclaimer and any sentence with numbers or
+    drug names are never dropped. Returns None when the range can't be reached that way
+    (or the script is already too short), so the caller can fall back to the LLM.
+    """
+    sentences = _split_sentences(script)
+    counts = [count_words(s) for s in sentences]
+    total = sum(counts)
+    if total < min_words:
+        return None
+    if total <= max_words:
+        return script
+
+    n = len(sentences)
+    # closing disclaimer: trailing sentences that read like one (or at least the last sentence)
+    tail = n - 1
+    while tail > 1 and _DISCLAIMER_RE.search(sentences[tail - 1]):
+        tail -= 1
+
+    candidates = []
+    for i in range(1, tail):
+        if _protected(sentences[i]):
+            continue
+        # inverted pyramid: later sentences matter less; named entities add some weight
+        position = 1.0 - i / n
+        entities = _entities(sentences[i]) / max(counts[i], 1)
+        candidates.append((position + entities, i))
+    candidates.sort()
+
+    dropped: set[int] = set()
+    for _, i in candidates:
+        if total <= max_words:
+            break
+        if total - counts[i] < min_words:
+            continue  # would undershoot; a shorter sentence may still fit
+        dropped.add(i)
+        total -= counts[i]
+
+    if total > max_words:
+        return None
+    return " ".join(s for i, s in enumerate(sentences) if i not in dropped)
@@ -0,0 +1,124 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta
+
+from app.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# memory | redis | sql | none  (redis/sql sit behind the in-process LRU)
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory").lower()
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_REDIS_URL = os.getenv("LLM_CACHE_REDIS_URL") or os.getenv("CELERY_RESULT_BACKEND", "")
+
+def make_key(model: str, system: str, user: str, temperature: float) -> str:
+    payload = json.dumps([model, system, user, round(temperature, 3)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class CacheBackend:
+    """Shared (cross-process) tier. Implementations must not raise on a miss."""
+
+    name = "none"
+
+    def get(self, key: str) -> str | None:
+        return None
+
+    def set(self, key: str, value: str, model: str) -> None:
+        pass
+
+class RedisBackend(CacheBackend):
+    name = "redis"
+
+    def __init__(self, url: str, ttl_seconds: int):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._ttl = ttl_seconds
+
+    def get(self, key: str) -> str | None:
+        raw = self._redis.get(f"llm-cache:{key}")
+        return raw.decode("utf-8") if raw is not None else None
+
+    def set(self, key: str, value: str, model: str) -> None:
+        self._redis.set(f"llm-cache:{key}", value.encode("utf-8"), ex=self._ttl)
+
+class SQLBackend(CacheBackend):
+    name = "sql"
+
+    def __init__(self, ttl_seconds: int):
+        self._ttl = ttl_seconds
+
+    def get(self, key: str) -> str | None:
+        from app.db import SessionLocal
+        from app.models import LLMCacheEntry
+
+        with SessionLocal() as db:
+            row = db.get(LLMCacheEntry, key)
+            if row is None or row.expires_at < datetime.utcnow():
+                return None
+            return row.response
+
+    def set(self, key: str, value: str, model: str) -> None:
+        from app.db import SessionLocal
+        from app.models import LLMCacheEntry
+
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            db.merge(LLMCacheEntry(
+                key=key,
+                model=model,
+                response=value,
+                created_at=now,
+                expires_at=now + timedelta(seconds=self._ttl),
+            ))
+            db.commit()
+
+class LLMCache:
+    """In-process LRU in front of an optional shared backend; hits/misses go to cache_requests_total."""
+
+    def __init__(self, shared: CacheBackend | None, max_entries: int, ttl_seconds: int):
+        self.shared = shared or CacheBackend()
+        self.memory = LRUCache(max_entries, ttl_seconds)
+
+    def get(self, key: str) -> str | None:
+        value = self.memory.get(key)
+        if value is None:
+            try:
+                value = self.shared.get(key)
+            except Exception:
+                logger.warning("LLM cache %s lookup failed", self.shared.name, exc_info=True)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: str, model: str) -> None:
+        self.memory.set(key, value)
+        try:
+            self.shared.set(key, value, model)
+        except Exception:
+            logger.warning("LLM cache %s store failed", self.shared.name, exc_info=True)
+
+def _build() -> LLMCache | None:
+    if LLM_CACHE_BACKEND == "none":
+        return None
+    shared = None
+    if LLM_CACHE_BACKEND == "redis":
+        shared = RedisBackend(LLM_CACHE_REDIS_URL, LLM_CACHE_TTL_SECONDS)
+    elif LLM_CACHE_BACKEND == "sql":
+        shared = SQLBackend(LLM_CACHE_TTL_SECONDS)
+    elif LLM_CACHE_BACKEND != "memory":
+        raise RuntimeError(f"Unknown LLM_CACHE_BACKEND: {LLM_CACHE_BACKEND}")
+    return LLMCache(shared, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS)
+
+cache = _build()
+
+def set_backend(backend: CacheBackend | None) -> None:
+    """
+    Swap the shared tier at runtime (scripts, benchmarks).
+    CacheBackend() keeps only the in-process LRU; None disables caching entirely.
+    """
+    global cache
+    cache = LLMCache(backend, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS) if backend else None
@@ -1,31 +1,55 @@
 import os
+import json
+import time
+import asyncio
+from datetime import datetime, timedelta
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from typing import Literal
 from pydantic import BaseModel, Field
-from celery.result import AsyncResult
+from celery import group, states
+from celery.result import GroupResult
 from sqlalchemy import select
 
-from app.db import get_db, engine
-from app.models import Base, Source, AudioAsset, Article
+from app import events, metrics, runs
+from app.audio_cache import file_sha256
+from app.cache import LRUCache
+from app.db import async_engine, async_session, get_async_db
+from app.models import Source, AudioAsset, Article, PipelineRun
 from app.rss_sources import SOURCES
-from app.tasks import celery_app
-
-Base.metadata.create_all(bind=engine)
+from app.celery_app import celery_app, generate_pipeline
 
 DEFAULT_TARGET_SECONDS = int(os.getenv("TTS_TARGET_SECONDS", "180"))
 DEFAULT_SCENES = int(os.getenv("STORYBOARD_SCENES", "8"))
+ANALYTICS_MAX_RUNS = int(os.getenv("ANALYTICS_MAX_RUNS", "50000"))  # rows aggregated per request
+
+# Audio files never change once written (a re-render is a new AudioAsset), so clients may keep them forever
+AUDIO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# audio_id -> (path, etag): repeat plays skip the DB entirely
+_audio_index = LRUCache(int(os.getenv("AUDIO_INDEX_MAX_ENTRIES", "4096")))
+# sources only change at startup (seeding); a short TTL covers manual edits
+_sources_cache = LRUCache(1, float(os.getenv("SOURCES_CACHE_TTL_SECONDS", "60")))
+
+# Job polls read the Redis result backend directly, without a thread per request
+_RESULT_BACKEND_URL = celery_app.conf.result_backend or ""
+_results_redis = None
+if _RESULT_BACKEND_URL.startswith(("redis://", "rediss://")):
+    import redis.asyncio
+
+    _results_redis = redis.asyncio.Redis.from_url(_RESULT_BACKEND_URL)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Seed RSS sources at startup
-    from sqlalchemy.orm import Session
-    with Session(engine) as db:
+    async with async_session() as db:
         for s in SOURCES:
-            if not db.get(Source, s["id"]):
+            if not await db.get(Source, s["id"]):
                 db.add(Source(**s))
-        db.commit()
+        await db.commit()
     yield
+    await async_engine().dispose()
 
 app = FastAPI(
     title="Medical RSS → Summary → ElevenLabs Audio (MVP)",
@@ -37,68 +61,301 @@ class GenerateReq(BaseModel):
     voice_id: str | None = None
     target_seconds: int = Field(default=DEFAULT_TARGET_SECONDS, ge=30, le=600)
     n_scenes: int = Field(default=DEFAULT_SCENES, ge=0, le=20)
+    force: bool = False  # regenerate text/script/storyboard/audio even if they exist
+
+class BatchGenerateReq(BaseModel):
+    source_ids: list[str] | Literal["all"] = "all"
+    voice_id: str | None = None
+    target_seconds: int = Field(default=DEFAULT_TARGET_SECONDS, ge=30, le=600)
+    n_scenes: int = Field(default=DEFAULT_SCENES, ge=0, le=20)
+    force: bool = False
+
+@app.middleware("http")
+async def _observe_requests(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # route template, not the raw path: /audio/{audio_id} is one series, not one per id
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    metrics.HTTP_REQUEST_SECONDS.labels(request.method, route, str(response.status_code)).observe(
+        time.perf_counter() - started
+    )
+    return response
 
 @app.get("/health")
-def health():
+async def health():
     return {"ok": True}
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
+
+async def _sources() -> list[dict]:
+    rows = _sources_cache.get("all")
+    if rows is None:
+        async with async_session() as db:
+            result = await db.execute(select(Source))
+            rows = [
+                {"id": r.id, "name": r.name, "rss_url": r.rss_url, "language_hint": r.language_hint}
+                for r in result.scalars()
+            ]
+        _sources_cache.set("all", rows)
+    return rows
+
 @app.get("/sources")
-def list_sources(db=Depends(get_db)):
-    rows = db.execute(select(Source)).scalars().all()
-    return [
-        {"id": r.id, "name": r.name, "rss_url": r.rss_url, "language_hint": r.language_hint}
-        for r in rows
-    ]
+async def list_sources():
+    return await _sources()
 
 @app.post("/generate")
-def generate(req: GenerateReq, db=Depends(get_db)):
+async def generate(req: GenerateReq):
     # Validate source exists before queueing
-    src = db.get(Source, req.source_id)
-    if not src:
+    if not any(s["id"] == req.source_id for s in await _sources()):
         raise HTTPException(status_code=404, detail="Unknown source_id")
 
-    # Prefer kwargs so it stays stable as you add params
-    task = celery_app.send_task(
-        "generate_latest_for_source",
-        kwargs={
-            "source_id": req.source_id,
-            "voice_id": req.voice_id,
-            "target_seconds": req.target_seconds,
-            "n_scenes": req.n_scenes,
-        },
+    # staged chain; the job id is the final task's id, so /jobs/{id} reports the whole run
+    workflow, job_id = generate_pipeline(
+        req.source_id,
+        voice_id=req.voice_id,
+        target_seconds=req.target_seconds,
+        n_scenes=req.n_scenes,
+        force=req.force,
     )
+    await run_in_threadpool(workflow.apply_async)
+    return {"task_id": job_id, "status": "queued"}
+
+@app.post("/generate/batch")
+async def generate_batch(req: BatchGenerateReq):
+    known = [s["id"] for s in await _sources()]
+    if req.source_ids == "all":
+        source_ids = known
+    else:
+        unknown = sorted(set(req.source_ids) - set(known))
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Unknown source_id: {', '.join(unknown)}")
+        source_ids = list(dict.fromkeys(req.source_ids))
+    if not source_ids:
+        raise HTTPException(status_code=400, detail="No sources to generate")
+
+    pipelines = [
+        generate_pipeline(
+            sid,
+            voice_id=req.voice_id,
+            target_seconds=req.target_seconds,
+            n_scenes=req.n_scenes,
+            force=req.force,
+        )
+        for sid in source_ids
+    ]
+    batch = group(workflow for workflow, _ in pipelines)
+
+    def _dispatch() -> GroupResult:
+        res = batch.apply_async()
+        res.save()  # so the status endpoint can restore the member ids from the batch id alone
+        return res
+
+    res = await run_in_threadpool(_dispatch)
+    return {
+        "batch_id": res.id,
+        "status": "queued",
+        "items": [{"source_id": sid, "task_id": job_id} for sid, (_, job_id) in zip(source_ids, pipelines)],
+    }
+
+@app.get("/generate/batch/{batch_id}")
+async def batch_status(batch_id: str):
+    res = await run_in_threadpool(GroupResult.restore, batch_id, app=celery_app)
+    if res is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    task_ids = [r.id for r in res.results]
+    metas = await _task_metas(task_ids)
+
+    items = []
+    counts: dict[str, int] = {}
+    totals = {"duration_seconds": 0, "word_count": 0, "reused": 0}
+    for task_id, meta in zip(task_ids, metas):
+        state = meta["status"]
+        counts[state] = counts.get(state, 0) + 1
+        item = {
+            "task_id": task_id,
+            # PROGRESS meta carries it while running, the result once done
+            "source_id": meta["result"].get("source_id") if isinstance(meta["result"], dict) else None,
+            "state": state,
+        }
+        if state == states.SUCCESS:
+            result = meta["result"] or {}
+            item["source_id"] = result.get("source_id", item["source_id"])
+            item["audio_id"] = result.get("audio_id")
+            if result.get("audio_id"):
+                item["audio_url"] = f"/audio/{result['audio_id']}"
+            item["duration_seconds"] = result.get("duration_seconds")
+            totals["duration_seconds"] += result.get("duration_seconds") or 0
+            totals["word_count"] += result.get("word_count") or 0
+            totals["reused"] += bool(result.get("reused"))
+        elif state in states.PROPAGATE_STATES:
+            item["error"] = str(meta["result"])
+        items.append(item)
+
+    done = sum(n for state, n in counts.items() if state in states.READY_STATES)
+    return {
+        "batch_id": batch_id,
+        "total": len(items),
+        "done": done,
+        "succeeded": counts.get(states.SUCCESS, 0),
+        "failed": done - counts.get(states.SUCCESS, 0),
+        "progress": done / len(items) if items else 1.0,
+        "states": counts,
+        "totals": totals,
+        "items": items,
+    }
+
+@app.post("/ingest")
+async def ingest(extract: bool = True):
+    task = await run_in_threadpool(celery_app.send_task, "ingest_all_sources", kwargs={"extract": extract})
     return {"task_id": task.id, "status": "queued"}
 
+async def _task_metas(task_ids: list[str]) -> list[dict]:
+    """Result-backend metadata for each task, in one round-trip when the backend is Redis."""
+    backend = celery_app.backend
+    if _results_redis is None:
+        def _read():
+            return [backend.get_task_meta(task_id) for task_id in task_ids]
+        return await run_in_threadpool(_read)
+    raws = await _results_redis.mget([backend.get_key_for_task(task_id) for task_id in task_ids])
+    return [
+        backend.decode_result(raw) if raw else {"status": states.PENDING, "result": None}
+        for raw in raws
+    ]
+
+async def _task_meta(task_id: str) -> dict:
+    return (await _task_metas([task_id]))[0]
+
 @app.get("/jobs/{task_id}")
-def job_status(task_id: str):
-    res = AsyncResult(task_id, app=celery_app)
-    payload = {"task_id": task_id, "state": res.state}
+async def job_status(task_id: str):
+    meta = await _task_meta(task_id)
+    payload = {"task_id": task_id, "state": meta["status"]}
 
-    if res.successful():
-        payload["result"] = res.result
+    if meta["status"] == states.SUCCESS:
+        payload["result"] = meta["result"]
 
         # If your task returns audio_id, expose a friendly URL too
-        audio_id = (res.result or {}).get("audio_id")
+        audio_id = (meta["result"] or {}).get("audio_id")
         if audio_id:
             payload["result"]["audio_url"] = f"/audio/{audio_id}"
 
-    elif res.failed():
-        payload["error"] = str(res.result)
+    elif meta["status"] in states.PROPAGATE_STATES:
+        payload["error"] = str(meta["result"])
+
+    elif meta["status"] == "PROGRESS":
+        payload["progress"] = meta["result"]  # last stage event
 
     return payload
 
+def _sse(event: dict) -> str:
+    return f"id: {event['seq']}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+async def _polled_events(task_id: str):
+    # no Redis to subscribe to: turn result-backend state changes into events
+    last = None
+    seq = 0
+    while True:
+        meta = await _task_meta(task_id)
+        state = meta["status"]
+        if state == states.SUCCESS:
+            seq += 1
+            result = meta["result"] or {}
+            yield {
+                "event": "done", "seq": seq, "audio_id": result.get("audio_id"),
+                "duration_seconds": result.get("duration_seconds"), "reused": bool(result.get("reused")),
+            }
+            return
+        if state in states.PROPAGATE_STATES:
+            seq += 1
+            yield {"event": "failed", "seq": seq, "error": str(meta["result"])}
+            return
+        current = (state, json.dumps(meta["result"], sort_keys=True, default=str))
+        if current != last and state == "PROGRESS":
+            seq += 1
+            yield {**meta["result"], "event": meta["result"].get("stage", "progress"), "seq": seq}
+        last = current
+        await asyncio.sleep(1.0)
+
+@app.get("/jobs/{task_id}/events")
+async def job_events(task_id: str, request: Request):
+    """
+    Server-Sent Events: feed_fetched, extracted, script_ready, tts_attempt..., then done or failed.
+    Reconnecting clients send Last-Event-ID and only get what they missed.
+    """
+    try:
+        after = int(request.headers.get("last-event-id") or 0)
+    except ValueError:
+        after = 0
+
+    async def body():
+        source = events.stream(task_id, after_seq=after) if events.enabled() else _polled_events(task_id)
+        async for event in source:
+            if await request.is_disconnected():
+                break
+            yield _sse(event) if event is not None else ": keep-alive\n\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _resolve_audio(audio_id: str) -> tuple[str, str] | None:
+    hit = _audio_index.get(audio_id)
+    if hit is not None:
+        return hit
+
+    async with async_session() as db:
+        audio = await db.get(AudioAsset, audio_id)
+        if not audio:
+            return None
+        if not audio.content_hash:
+            # rendered before hashes were recorded: fill it in once
+            try:
+                audio.content_hash = await run_in_threadpool(file_sha256, audio.file_path)
+                audio.size_bytes = os.path.getsize(audio.file_path)
+            except OSError:
+                return None
+            await db.commit()
+        entry = (audio.file_path, f'"{audio.content_hash}"')
+
+    _audio_index.set(audio_id, entry)
+    return entry
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # weak comparison, as RFC 9110 asks for If-None-Match
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
 @app.get("/audio/{audio_id}")
-def get_audio(audio_id: str, db=Depends(get_db)):
-    audio = db.get(AudioAsset, audio_id)
-    if not audio:
+async def get_audio(audio_id: str, request: Request):
+    entry = await _resolve_audio(audio_id)
+    if entry is None:
         raise HTTPException(status_code=404, detail="Audio not found")
-    if not os.path.exists(audio.file_path):
+    path, etag = entry
+    headers = {"ETag": etag, "Cache-Control": AUDIO_CACHE_CONTROL}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        # one stat, handed to FileResponse so it doesn't stat again
+        st = os.stat(path)
+    except FileNotFoundError:
+        _audio_index.pop(audio_id)
         raise HTTPException(status_code=404, detail="File missing on disk")
-    return FileResponse(audio.file_path, media_type="audio/mpeg", filename=os.path.basename(audio.file_path))
+    return FileResponse(
+        path, media_type="audio/mpeg", filename=f"{audio_id}.mp3", headers=headers, stat_result=st,
+    )
 
 @app.get("/articles/{article_id}")
-def get_article(article_id: str, db=Depends(get_db)):
-    article = db.get(Article, article_id)
+async def get_article(article_id: str, db=Depends(get_async_db)):
+    article = await db.get(Article, article_id)
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
 
@@ -117,3 +374,53 @@ def get_article(article_id: str, db=Depends(get_db)):
         out["storyboard"] = article.storyboard_json
 
     return out
+
+# what runs.aggregate reads; full rows would drag every column of up to ANALYTICS_MAX_RUNS runs along
+_RUN_COLUMNS = (
+    PipelineRun.source_id, PipelineRun.voice_id, PipelineRun.started_at, PipelineRun.status,
+    PipelineRun.wall_seconds, PipelineRun.work_seconds, PipelineRun.stages, PipelineRun.cost_usd,
+    PipelineRun.tts_retries, PipelineRun.tts_characters, PipelineRun.llm_input_tokens, PipelineRun.llm_output_tokens,
+)
+
+_RUN_GROUPS = {
+    "source": lambda r: r.source_id,
+    "voice": lambda r: r.voice_id,
+    "day": lambda r: r.started_at.date().isoformat(),
+}
+
+@app.get("/analytics/runs")
+async def run_analytics(
+    group_by: Literal["source", "voice", "day"] = "source",
+    days: int = Query(default=7, ge=1, le=365),
+    source_id: str | None = None,
+    voice_id: str | None = None,
+    db=Depends(get_async_db),
+):
+    """
+    Pipeline runs of the last `days` days grouped by source, voice or day; slowest (p95) first.
+    Past ANALYTICS_MAX_RUNS only the most recent runs count, and `truncated` says so.
+    """
+    q = select(*_RUN_COLUMNS).where(PipelineRun.started_at >= datetime.utcnow() - timedelta(days=days))
+    if source_id:
+        q = q.where(PipelineRun.source_id == source_id)
+    if voice_id:
+        q = q.where(PipelineRun.voice_id == voice_id)
+    q = q.order_by(PipelineRun.started_at.desc()).limit(ANALYTICS_MAX_RUNS + 1)
+    rows = (await db.execute(q)).all()
+    truncated = len(rows) > ANALYTICS_MAX_RUNS
+    rows = rows[:ANALYTICS_MAX_RUNS]
+    groups = await run_in_threadpool(runs.aggregate, rows, _RUN_GROUPS[group_by])
+    return {
+        "group_by": group_by,
+        "days": days,
+        "runs_considered": len(rows),
+        "truncated": truncated,
+        "groups": groups,
+    }
+
+@app.get("/runs/{job_id}")
+async def get_run(job_id: str, db=Depends(get_async_db)):
+    run = await db.get(PipelineRun, job_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return {c.name: getattr(run, c.name) for c in PipelineRun.__table__.columns}
@@ -0,0 +1,118 @@
+import os
+import glob
+import time
+import logging
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, start_http_server,
+)
+from prometheus_client import multiprocess
+
+logger = logging.getLogger(__name__)
+
+# Set for prefork workers / multi-process servers: every process writes here, the exporter sums them
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9808"))  # worker exporter; the API serves /metrics itself
+
+# 5 ms .. 5 min: covers a DB commit as well as a long TTS stream
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+FEED_FETCH_SECONDS = Histogram(
+    "feed_fetch_seconds", "RSS/Atom download time", ["outcome"], buckets=_BUCKETS,
+)
+EXTRACT_SECONDS = Histogram(
+    "extract_seconds", "Article text extraction time, by the path that produced the text", ["path"], buckets=_BUCKETS,
+)
+LLM_CALL_SECONDS = Histogram(
+    "llm_call_seconds", "OpenAI call time incl. rate-limit waits and 429 retries (cache hits excluded)",
+    ["purpose"], buckets=_BUCKETS,
+)
+TTS_ATTEMPT_SECONDS = Histogram(
+    "tts_attempt_seconds", "One ElevenLabs request, sent to last byte (rate-limit wait excluded)",
+    ["outcome"], buckets=_BUCKETS,
+)
+DB_COMMIT_SECONDS = Histogram(
+    "db_commit_seconds", "Session.commit() time, flush included", buckets=_BUCKETS,
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "API request time", ["method", "route", "status"], buckets=_BUCKETS,
+)
+
+TTS_RETRIES = Counter(
+    "tts_retries_total", "Extra TTS requests: provider errors (request) or re-renders after a duration miss", ["reason"],
+)
+TTS_DURATION_REJECTIONS = Counter(
+    "tts_duration_rejections_total", "Renderings outside the accepted duration window",
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Lookups in the extraction, LLM and audio caches", ["cache", "result"],
+)
+PROVIDER_ERRORS = Counter(
+    "provider_errors_total", "Failed OpenAI / ElevenLabs requests", ["provider", "status"],
+)
+
+@contextmanager
+def timer(histogram: Histogram, **labels) -> Iterator[dict]:
+    """
+    Observes the body's duration. Labels may be filled in from inside:
+        with timer(EXTRACT_SECONDS) as labels: ...; labels["path"] = "precision"
+    """
+    started = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        metric = histogram.labels(**labels) if labels else histogram
+        metric.observe(time.perf_counter() - started)
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+def error_status(exc: BaseException) -> str:
+    """HTTP status of a provider error if it has one, else the exception type."""
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    return str(status) if status else type(exc).__name__
+
+def _registry() -> CollectorRegistry:
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+def render() -> tuple[bytes, str]:
+    """Exposition body and content type, for the API's /metrics."""
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+def instrument_sessions() -> None:
+    """Times every ORM commit, sync or async (AsyncSession commits through a sync Session)."""
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    def _before(session):
+        session.info["_commit_started"] = time.perf_counter()
+
+    def _after(session):
+        started = session.info.pop("_commit_started", None)
+        if started is not None:
+            DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
+
+    event.listen(Session, "before_commit", _before)
+    event.listen(Session, "after_commit", _after)
+    event.listen(Session, "after_rollback", lambda session: session.info.pop("_commit_started", None))
+
+def start_worker_exporter(port: int = METRICS_PORT) -> None:
+    """HTTP exporter in the Celery main process. Prefork children only show up with PROMETHEUS_MULTIPROC_DIR."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        # files left by a previous run would be summed into this one
+        for path in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, "*.db")):
+            os.remove(path)
+    else:
+        logger.warning("PROMETHEUS_MULTIPROC_DIR is not set: prefork children's metrics won't be exported")
+    start_http_server(port, registry=_registry())
+    logger.info("Metrics exporter listening on :%s", port)
+
+def mark_process_dead(pid: int) -> None:
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
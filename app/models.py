@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import String, Text, DateTime, ForeignKey, UniqueConstraint, Integer, JSON, Index, Float
+from sqlalchemy import String, Text, DateTime, ForeignKey, UniqueConstraint, Integer, JSON, Index, Float, Boolean
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 class Base(DeclarativeBase):
@@ -13,6 +13,12 @@ class Source(Base):
     rss_url: Mapped[str] = mapped_column(String, nullable=False)
     language_hint: Mapped[str | None] = mapped_column(String, nullable=True)
 
+    # Conditional-GET validators from the last successful poll
+    etag: Mapped[str | None] = mapped_column(String, nullable=True)
+    last_modified: Mapped[str | None] = mapped_column(String, nullable=True)
+    content_hash: Mapped[str | None] = mapped_column(String, nullable=True)  # sha256 of the feed body
+    last_fetched_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
     articles: Mapped[list["Article"]] = relationship(back_populates="source", cascade="all, delete-orphan")
 
 class Article(Base):
@@ -23,6 +29,7 @@ class Article(Base):
     title: Mapped[str] = mapped_column(String, nullable=False)
     url: Mapped[str] = mapped_column(String, nullable=False)
     published_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    summary: Mapped[str | None] = mapped_column(Text, nullable=True)  # RSS summary/description, extraction fallback
 
     # Extraction / summary
     raw_text: Mapped[str | None] = mapped_column(Text, nullable=True)
@@ -62,9 +69,13 @@ class AudioAsset(Base):
     target_seconds: Mapped[int] = mapped_column(Integer, default=180, nullable=False)
     estimated_seconds: Mapped[int | None] = mapped_column(Integer, nullable=True)
     word_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    script_text: Mapped[str | None] = mapped_column(Text, nullable=True)  # exact text that was voiced
 
     # Output
     file_path: Mapped[str] = mapped_column(String, nullable=False)
+    audio_key: Mapped[str | None] = mapped_column(ForeignKey("audio_blobs.key"), nullable=True)  # shared rendering
+    content_hash: Mapped[str | None] = mapped_column(String, nullable=True)  # sha256 of the file, served as ETag
+    size_bytes: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
     # Observability
     status: Mapped[str] = mapped_column(String, default="created", nullable=False)  # created|ready|failed
@@ -78,6 +89,23 @@ class AudioAsset(Base):
         Index("ix_audio_article_created", "article_id", "created_at"),
     )
 
+class AudioBlob(Base):
+    """One rendered audio file, addressed by tts.render_key() (+ content hash for forced re-renders); never rewritten."""
+    __tablename__ = "audio_blobs"
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    file_path: Mapped[str] = mapped_column(String, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    content_hash: Mapped[str | None] = mapped_column(String, nullable=True)  # sha256 of the file bytes
+    duration_seconds: Mapped[int] = mapped_column(Integer, nullable=False)
+    refcount: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # AudioAssets pointing here
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_audio_blobs_evict", "refcount", "last_used_at"),
+    )
+
 class VoiceCalibration(Base):
     __tablename__ = "voice_calibration"
     voice_id: Mapped[str] = mapped_column(String, primary_key=True)
@@ -85,4 +113,73 @@ class VoiceCalibration(Base):
     speed: Mapped[float] = mapped_column(Float, primary_key=True, default=1.0)
 
     wpm_estimate: Mapped[float] = mapped_column(Float, nullable=False, default=140.0)
-    samples: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
\ No newline at end of file
+    samples: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+class DurationModel(Base):
+    """Per-voice linear duration model (see app/duration.py), updated by recursive least squares."""
+    __tablename__ = "duration_models"
+    voice_id: Mapped[str] = mapped_column(String, primary_key=True)
+    model_id: Mapped[str] = mapped_column(String, primary_key=True)
+    speed: Mapped[float] = mapped_column(Float, primary_key=True, default=1.0)
+    language: Mapped[str] = mapped_column(String, primary_key=True)  # "es", "en"
+
+    coef: Mapped[list] = mapped_column(JSON, nullable=False)
+    cov: Mapped[list] = mapped_column(JSON, nullable=False)  # RLS inverse-correlation matrix
+    samples: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache"
+    key: Mapped[str] = mapped_column(String, primary_key=True)  # sha256(model, system, user, temperature)
+    model: Mapped[str] = mapped_column(String, nullable=False)
+    response: Mapped[str] = mapped_column(Text, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_llm_cache_expires_at", "expires_at"),
+    )
+
+class PipelineRun(Base):
+    """
+    Ledger of one generate job: how long each stage took and what it spent (see app/runs.py).
+    Ids are plain columns, not foreign keys, so the history outlives article/audio cleanup.
+    """
+    __tablename__ = "pipeline_runs"
+    id: Mapped[str] = mapped_column(String, primary_key=True)  # job id
+    source_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    article_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    audio_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    voice_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    model_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    target_seconds: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    status: Mapped[str] = mapped_column(String, nullable=False)  # ok|reused|failed
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    queued_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    finished_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    wall_seconds: Mapped[float] = mapped_column(Float, nullable=False)  # queued -> finished
+    work_seconds: Mapped[float] = mapped_column(Float, nullable=False)  # sum of stage times
+    stages: Mapped[dict] = mapped_column(JSON, nullable=False)  # {"fetch": {"seconds": 0.4, ...}, ...}
+
+    llm_calls: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    llm_cache_hits: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    llm_input_tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    llm_output_tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    tts_requests: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # HTTP requests, chunks included
+    tts_characters: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # billed characters
+    tts_retries: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # failed requests + re-renders
+    tts_renders: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # duration-window attempts
+    extract_path: Mapped[str | None] = mapped_column(String, nullable=True)  # stored|cache|precision|fallback
+    audio_cached: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
+    duration_seconds: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    cost_usd: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)  # estimate from list prices
+
+    __table_args__ = (
+        Index("ix_pipeline_runs_started", "started_at"),
+        Index("ix_pipeline_runs_source_started", "source_id", "started_at"),
+        Index("ix_pipeline_runs_voice_started", "voice_id", "started_at"),
+    )
@@ -0,0 +1,140 @@
+from collections.abc import Iterator
+from typing import NamedTuple
+
+# kbps by (version, layer); version 1 = MPEG-1, 2 = MPEG-2 and 2.5
+_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# by the 2-bit version field: 0 = 2.5, 2 = 2, 3 = 1
+_SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+
+class FrameHeader(NamedTuple):
+    length: int  # bytes, header included
+    samples: int
+    sample_rate: int
+
+def parse_frame_header(b: bytes) -> FrameHeader | None:
+    """Decodes a 4-byte MPEG audio frame header; None if it isn't one."""
+    if len(b) < 4 or b[0] != 0xFF or (b[1] & 0xE0) != 0xE0:
+        return None
+    version_bits = (b[1] >> 3) & 0x03
+    layer_bits = (b[1] >> 1) & 0x03
+    bitrate_idx = (b[2] >> 4) & 0x0F
+    rate_idx = (b[2] >> 2) & 0x03
+    padding = (b[2] >> 1) & 0x01
+    if version_bits == 1 or layer_bits == 0 or bitrate_idx in (0, 15) or rate_idx == 3:
+        return None  # reserved / free-format: not something a TTS API sends
+
+    version = 1 if version_bits == 3 else 2
+    layer = 4 - layer_bits
+    bitrate = _BITRATES[(version, layer)][bitrate_idx] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][rate_idx]
+
+    if layer == 1:
+        return FrameHeader((12 * bitrate // sample_rate + padding) * 4, 384, sample_rate)
+    if layer == 3 and version == 2:
+        return FrameHeader(72 * bitrate // sample_rate + padding, 576, sample_rate)
+    return FrameHeader(144 * bitrate // sample_rate + padding, 1152, sample_rate)
+
+def id3v2_size(b: bytes) -> int:
+    """Total size of a leading ID3v2 tag (0 if none)."""
+    if len(b) < 10 or b[:3] != b"ID3":
+        return 0
+    size = (b[6] & 0x7F) << 21 | (b[7] & 0x7F) << 14 | (b[8] & 0x7F) << 7 | (b[9] & 0x7F)
+    footer = 10 if b[5] & 0x10 else 0
+    return 10 + size + footer
+
+class DurationCounter:
+    """
+    Tracks the playback length of an MP3 stream as bytes arrive, from frame headers alone.
+    Only keeps the bytes of the frame currently being read.
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.frames = 0
+        self._buf = bytearray()
+        self._skip = 0  # bytes still to drop (rest of a frame / ID3 tag)
+        self._started = False
+
+    def feed(self, chunk: bytes) -> float:
+        if self._skip:
+            dropped = min(self._skip, len(chunk))
+            self._skip -= dropped
+            chunk = chunk[dropped:]
+        self._buf += chunk
+
+        if not self._started:
+            if len(self._buf) < 10:
+                return self.seconds
+            self._skip = id3v2_size(self._buf)
+            self._started = True
+            dropped = min(self._skip, len(self._buf))
+            self._skip -= dropped
+            del self._buf[:dropped]
+
+        pos = 0
+        buf = self._buf
+        while len(buf) - pos >= 4:
+            header = parse_frame_header(buf[pos:pos + 4])
+            if header is None:
+                pos += 1  # resync
+                continue
+            self.seconds += header.samples / header.sample_rate
+            self.frames += 1
+            if len(buf) - pos >= header.length:
+                pos += header.length
+            else:
+                self._skip = header.length - (len(buf) - pos)
+                pos = len(buf)
+        del buf[:pos]
+        return self.seconds
+
+def _is_vbr_info(frame: bytes) -> bool:
+    # Xing/Info/VBRI frames describe the whole original file (length, seek table)
+    head = frame[:64]
+    return b"Xing" in head or b"Info" in head or b"VBRI" in head
+
+def iter_frames(data: bytes) -> Iterator[bytes]:
+    """Audio frames of an MP3 file, without ID3 tags or the leading VBR info frame."""
+    pos = id3v2_size(data)
+    first = True
+    while len(data) - pos >= 4:
+        header = parse_frame_header(data[pos:pos + 4])
+        if header is None:
+            pos += 1
+            continue
+        frame = data[pos:pos + header.length]
+        pos += header.length
+        if len(frame) < header.length:
+            break  # truncated tail
+        if first and _is_vbr_info(frame):
+            first = False
+            continue
+        first = False
+        yield frame
+
+def concat_files(sources: list[str], dest: str) -> float:
+    """
+    Joins MP3 files frame by frame, without re-encoding. All inputs must share
+    sample rate and channel layout (one TTS voice/output format). Returns seconds.
+    """
+    seconds = 0.0
+    with open(dest, "wb") as out:
+        for src in sources:
+            with open(src, "rb") as f:
+                data = f.read()
+            for frame in iter_frames(data):
+                header = parse_frame_header(frame)
+                seconds += header.samples / header.sample_rate
+                out.write(frame)
+    return seconds
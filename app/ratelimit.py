@@ -0,0 +1,315 @@
+import os
+import time
+import uuid
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Callable, Iterator, TypeVar
+
+from app.metrics import PROVIDER_ERRORS, error_status
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Shared by every worker through Redis; without it each process only limits itself
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL") or os.getenv("CELERY_BROKER_URL", "")
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "300"))
+RATE_LIMIT_LEASE_SECONDS = float(os.getenv("RATE_LIMIT_LEASE_SECONDS", "600"))  # reclaims slots of crashed workers
+
+@dataclass(frozen=True)
+class Limits:
+    rate: float           # requests per second (token refill)
+    burst: float          # bucket size
+    max_concurrency: int  # ceiling for the adaptive in-flight limit
+    min_concurrency: int = 1
+
+def _limits(provider: str, rate: str, concurrency: str) -> Limits:
+    prefix = f"RATE_LIMIT_{provider.upper()}"
+    rps = float(os.getenv(f"{prefix}_RPS", rate))
+    return Limits(
+        rate=rps,
+        burst=float(os.getenv(f"{prefix}_BURST", str(max(1.0, rps)))),
+        max_concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+    )
+
+# ElevenLabs caps concurrent requests per plan; OpenAI mostly meters requests and tokens per minute
+PROVIDERS = {
+    "openai": _limits("openai", "5", "16"),
+    "elevenlabs": _limits("elevenlabs", "2", "4"),
+}
+
+class RateLimitTimeout(Exception):
+    """No slot became free within RATE_LIMIT_MAX_WAIT_SECONDS."""
+
+def _status(exc: BaseException) -> int | None:
+    return getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+
+def is_rate_limited(exc: BaseException) -> bool:
+    return _status(exc) == 429
+
+def is_retriable(exc: BaseException) -> bool:
+    """
+    429s, 5xx, timeouts and dropped connections. Everything else (400, 401/403, 404, context
+    length) fails the same way on every attempt, so it is raised at once, as the SDKs do.
+    """
+    status = _status(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    import httpx
+
+    transient: tuple[type, ...] = (httpx.TransportError,)  # timeouts, resets, refused connects
+    try:
+        import openai
+
+        transient += (openai.APIConnectionError,)  # APITimeoutError is a subclass
+    except ImportError:
+        pass
+    return isinstance(exc, transient)
+
+def retry_after_seconds(exc: BaseException) -> float:
+    """Retry-After (seconds or HTTP date) / retry-after-ms from the error's response; 0 if absent."""
+    headers = getattr(exc, "headers", None) or getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        ms = headers.get("retry-after-ms")
+        if ms:
+            return float(ms) / 1000.0
+        value = headers.get("retry-after")
+        if not value:
+            return 0.0
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return 0.0
+
+# Token bucket + in-flight leases + AIMD concurrency limit, all in one hash/zset pair per key.
+# Time comes from Redis so worker clocks don't matter. Replies are strings: Lua numbers truncate.
+_ACQUIRE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rate, burst, max_limit = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+local s = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'limit', 'blocked_until')
+local tokens = tonumber(s[1]) or burst
+local ts = tonumber(s[2]) or now
+local limit = tonumber(s[3]) or max_limit
+local blocked = tonumber(s[4]) or 0
+if now < blocked then
+  return tostring(blocked - now)
+end
+if redis.call('ZCARD', KEYS[2]) >= math.floor(limit) then
+  return '-1'
+end
+tokens = math.min(burst, tokens + (now - ts) * rate)
+if tokens < 1 then
+  redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+  return tostring((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'ts', tostring(now), 'limit', tostring(limit))
+redis.call('ZADD', KEYS[2], now + tonumber(ARGV[5]), ARGV[4])
+redis.call('EXPIRE', KEYS[1], 86400)
+redis.call('EXPIRE', KEYS[2], 86400)
+return '0'
+"""
+
+_RELEASE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local outcome, retry_after = ARGV[2], tonumber(ARGV[3])
+local max_limit, min_limit = tonumber(ARGV[4]), tonumber(ARGV[5])
+redis.call('ZREM', KEYS[2], ARGV[1])
+local limit = tonumber(redis.call('HGET', KEYS[1], 'limit')) or max_limit
+if outcome == 'ok' then
+  limit = math.min(max_limit, limit + 1 / limit)
+elseif outcome == 'throttled' then
+  local last = tonumber(redis.call('HGET', KEYS[1], 'decreased_at')) or 0
+  if now - last > 1 then
+    limit = math.max(min_limit, limit / 2)
+    redis.call('HSET', KEYS[1], 'decreased_at', tostring(now))
+  end
+  if retry_after > 0 then
+    local blocked = tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0
+    redis.call('HSET', KEYS[1], 'blocked_until', tostring(math.max(blocked, now + retry_after)))
+  end
+  redis.call('HSET', KEYS[1], 'tokens', '0', 'ts', tostring(now))
+end
+redis.call('HSET', KEYS[1], 'limit', tostring(limit))
+return tostring(limit)
+"""
+
+class _RedisState:
+    def __init__(self, client, key: str):
+        self._keys = [f"{key}:state", f"{key}:inflight"]
+        self._acquire = client.register_script(_ACQUIRE)
+        self._release = client.register_script(_RELEASE)
+
+    def try_acquire(self, lease: str, limits: Limits) -> float:
+        return float(self._acquire(
+            keys=self._keys,
+            args=[limits.rate, limits.burst, limits.max_concurrency, lease, RATE_LIMIT_LEASE_SECONDS],
+        ))
+
+    def release(self, lease: str, outcome: str, retry_after: float, limits: Limits) -> float:
+        return float(self._release(
+            keys=self._keys,
+            args=[lease, outcome, retry_after, limits.max_concurrency, limits.min_concurrency],
+        ))
+
+class _LocalState:
+    """Same algorithm in-process, for setups without Redis."""
+
+    def __init__(self, limits: Limits):
+        self._lock = threading.Lock()
+        self._tokens = limits.burst
+        self._ts = time.monotonic()
+        self._limit = float(limits.max_concurrency)
+        self._blocked_until = 0.0
+        self._decreased_at = 0.0
+        self._inflight: set[str] = set()
+
+    def try_acquire(self, lease: str, limits: Limits) -> float:
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if len(self._inflight) >= int(self._limit):
+                return -1.0
+            self._tokens = min(limits.burst, self._tokens + (now - self._ts) * limits.rate)
+            self._ts = now
+            if self._tokens < 1:
+                return (1 - self._tokens) / limits.rate
+            self._tokens -= 1
+            self._inflight.add(lease)
+            return 0.0
+
+    def release(self, lease: str, outcome: str, retry_after: float, limits: Limits) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._inflight.discard(lease)
+            if outcome == "ok":
+                self._limit = min(limits.max_concurrency, self._limit + 1 / self._limit)
+            elif outcome == "throttled":
+                if now - self._decreased_at > 1:
+                    self._limit = max(limits.min_concurrency, self._limit / 2)
+                    self._decreased_at = now
+                if retry_after > 0:
+                    self._blocked_until = max(self._blocked_until, now + retry_after)
+                self._tokens, self._ts = 0.0, now
+            return self._limit
+
+class Limiter:
+    """
+    Cluster-wide limiter for one provider/model: a token bucket for request rate plus
+    an AIMD concurrency limit (+1 per window of successes, halved on a 429, paused for Retry-After).
+    Redis failures degrade to "no limit" rather than failing the call.
+    """
+
+    def __init__(self, provider: str, model: str, limits: Limits, state):
+        self.provider = provider
+        self.model = model
+        self.limits = limits
+        self._state = state
+
+    def acquire(self, cancel: threading.Event | None = None) -> str | None:
+        """A lease to release() later; None when there is nothing to release (no limiter, or `cancel` set)."""
+        lease = uuid.uuid4().hex
+        deadline = time.monotonic() + RATE_LIMIT_MAX_WAIT_SECONDS
+        while True:
+            if cancel is not None and cancel.is_set():
+                return None
+            try:
+                wait = self._state.try_acquire(lease, self.limits)
+            except Exception:
+                logger.warning("Rate limiter unavailable for %s/%s", self.provider, self.model, exc_info=True)
+                return None
+            if wait == 0:
+                return lease
+            if time.monotonic() >= deadline:
+                raise RateLimitTimeout(f"No {self.provider} slot for {self.model} in {RATE_LIMIT_MAX_WAIT_SECONDS:.0f}s")
+            # -1: all concurrency slots taken, poll; jitter keeps workers from waking in lockstep
+            delay = 0.1 if wait < 0 else min(wait, 5.0)
+            if cancel is not None:
+                cancel.wait(delay * random.uniform(1.0, 1.2))
+            else:
+                time.sleep(delay * random.uniform(1.0, 1.2))
+
+    def release(self, lease: str | None, outcome: str, retry_after: float = 0.0) -> None:
+        if lease is None:
+            return
+        try:
+            limit = self._state.release(lease, outcome, retry_after, self.limits)
+        except Exception:
+            logger.warning("Rate limiter release failed for %s/%s", self.provider, self.model, exc_info=True)
+            return
+        if outcome == "throttled":
+            logger.info(
+                "%s 429 on %s: concurrency limit now %.1f, retry after %.1fs",
+                self.provider, self.model, limit, retry_after,
+            )
+
+_limiters: dict[tuple[str, str], Limiter] = {}
+_limiters_lock = threading.Lock()
+_redis = None
+
+def limiter(provider: str, model: str) -> Limiter:
+    global _redis
+    with _limiters_lock:
+        found = _limiters.get((provider, model))
+        if found is None:
+            limits = PROVIDERS[provider]
+            if RATE_LIMIT_REDIS_URL.startswith(("redis://", "rediss://")):
+                if _redis is None:
+                    import redis
+
+                    _redis = redis.Redis.from_url(RATE_LIMIT_REDIS_URL)
+                state = _RedisState(_redis, f"ratelimit:{provider}:{model}")
+            else:
+                state = _LocalState(limits)
+            found = _limiters[(provider, model)] = Limiter(provider, model, limits, state)
+        return found
+
+@contextmanager
+def slot(provider: str, model: str, cancel: threading.Event | None = None) -> Iterator[None]:
+    """
+    Holds one request slot for the body; a 429 raised inside feeds the AIMD controller.
+    Setting `cancel` stops the wait for a slot: the body then runs without one and should check it.
+    """
+    lim = limiter(provider, model)
+    lease = lim.acquire(cancel)
+    outcome, retry_after = "error", 0.0
+    try:
+        yield
+        outcome = "ok"
+    except Exception as e:
+        if is_rate_limited(e):
+            outcome, retry_after = "throttled", retry_after_seconds(e)
+        # only what the SDKs / HTTP stack raise; our own exceptions (duration cap, cancel) pass through
+        if type(e).__module__.split(".")[0] in ("openai", "elevenlabs", "httpx", "httpcore"):
+            PROVIDER_ERRORS.labels(provider, error_status(e)).inc()
+        raise
+    finally:
+        lim.release(lease, outcome, retry_after)
+
+def call(provider: str, model: str, fn: Callable[[], T], *, retries: int = 3) -> T:
+    """
+    fn() inside a slot, retried up to `retries` times if the error is transient (is_retriable).
+    After a 429 the limiter does the waiting (Retry-After, halved concurrency); 5xx and
+    connection errors get the usual exponential backoff.
+    """
+    for attempt in range(retries):
+        try:
+            with slot(provider, model):
+                return fn()
+        except RateLimitTimeout:
+            raise
+        except Exception as e:
+            if attempt == retries - 1 or not is_retriable(e):
+                raise
+            if not is_rate_limited(e):
+                time.sleep(0.8 * (2 ** attempt))
+    raise RuntimeError("unreachable")
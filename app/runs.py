@@ -0,0 +1,193 @@
+import os
+import time
+import logging
+import threading
+import functools
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+# List prices used for the cost estimate (USD); override for your model and plan
+OPENAI_USD_PER_1M_INPUT = float(os.getenv("OPENAI_USD_PER_1M_INPUT", "0.15"))
+OPENAI_USD_PER_1M_OUTPUT = float(os.getenv("OPENAI_USD_PER_1M_OUTPUT", "0.60"))
+ELEVENLABS_USD_PER_1K_CHARS = float(os.getenv("ELEVENLABS_USD_PER_1K_CHARS", "0.30"))
+
+# summed over stages into PipelineRun columns
+COUNTERS = (
+    "llm_calls", "llm_cache_hits", "llm_input_tokens", "llm_output_tokens",
+    "tts_requests", "tts_characters", "tts_retries", "tts_renders",
+)
+
+class _Usage:
+    """What one stage spent, filled in from deep inside summarize/tts/extract."""
+
+    def __init__(self):
+        self.counts: dict[str, int] = {}
+        self.notes: dict[str, object] = {}
+        self._lock = threading.Lock()  # chunked TTS records from several threads
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for k, v in counts.items():
+                self.counts[k] = self.counts.get(k, 0) + (v or 0)
+
+_current: ContextVar[_Usage | None] = ContextVar("pipeline_run_usage", default=None)
+
+def record(**counts: int) -> None:
+    """Adds to the running stage's counters; a no-op outside a pipeline stage."""
+    usage = _current.get()
+    if usage is not None:
+        usage.add(**counts)
+
+def note(**values) -> None:
+    usage = _current.get()
+    if usage is not None:
+        usage.notes.update(values)
+
+def stage(name: str) -> Callable:
+    """
+    Times a `_stage_*` function and files its usage under state["run"]["stages"][name].
+    Stages taking the list of branch states (finalize) record into the last one.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(state, *args, **kwargs):
+            target = state[-1] if isinstance(state, list) else state
+            run = target.setdefault("run", {"stages": {}})
+            run.setdefault("started_at", time.time())
+            usage = _Usage()
+            token = _current.set(usage)
+            started = time.perf_counter()
+            try:
+                return fn(state, *args, **kwargs)
+            finally:
+                _current.reset(token)
+                run["stages"][name] = {
+                    "seconds": round(time.perf_counter() - started, 3), **usage.counts, **usage.notes,
+                }
+        return wrapper
+    return decorator
+
+def merge(states: list[dict]) -> dict:
+    """Joins the run records of parallel branches (each carries a copy of what came before)."""
+    merged = dict(states[-1])
+    run = dict(merged.get("run") or {"stages": {}})
+    stages = {}
+    for s in states:
+        r = s.get("run") or {}
+        stages.update(r.get("stages") or {})
+        if r.get("started_at"):
+            run["started_at"] = min(run.get("started_at") or r["started_at"], r["started_at"])
+    run["stages"] = stages
+    merged["run"] = run
+    return merged
+
+def estimate_cost(llm_input_tokens: int, llm_output_tokens: int, tts_characters: int) -> float:
+    return round(
+        llm_input_tokens / 1e6 * OPENAI_USD_PER_1M_INPUT
+        + llm_output_tokens / 1e6 * OPENAI_USD_PER_1M_OUTPUT
+        + tts_characters / 1e3 * ELEVENLABS_USD_PER_1K_CHARS,
+        6,
+    )
+
+def finish(state: dict, result: dict | None = None, error: BaseException | None = None) -> None:
+    """Writes the job's PipelineRun row. Never raises: bookkeeping must not fail a job."""
+    try:
+        _save(state, result, error)
+    except Exception:
+        logger.warning("Could not record pipeline run for job %s", state.get("job_id"), exc_info=True)
+
+def _save(state: dict, result: dict | None, error: BaseException | None) -> None:
+    from app.db import SessionLocal
+    from app.models import PipelineRun
+
+    run = state.get("run") or {"stages": {}}
+    stages = run.get("stages") or {}
+    totals = {k: sum(int(s.get(k) or 0) for s in stages.values()) for k in COUNTERS}
+    finished = time.time()
+    queued = state.get("queued_at") or run.get("started_at") or finished
+    extract = stages.get("extract") or {}
+    synth = stages.get("synthesize") or {}
+
+    if error is not None:
+        status = "failed"
+    elif result and result.get("reused"):
+        status = "reused"
+    else:
+        status = "ok"
+
+    row = PipelineRun(
+        # jobs started outside a worker have no id; the row still counts in the aggregates
+        id=state.get("job_id") or f"local-{time.time_ns()}",
+        source_id=state.get("source_id"),
+        article_id=(result or {}).get("article_id") or state.get("article_id"),
+        audio_id=(result or {}).get("audio_id"),
+        voice_id=state.get("voice_id"),
+        model_id=state.get("model_id"),
+        target_seconds=state.get("target_seconds"),
+        status=status,
+        error=f"{type(error).__name__}: {error}"[:2000] if error is not None else None,
+        queued_at=datetime.utcfromtimestamp(queued),
+        started_at=datetime.utcfromtimestamp(run.get("started_at") or queued),
+        finished_at=datetime.utcfromtimestamp(finished),
+        wall_seconds=round(finished - queued, 3),
+        work_seconds=round(sum(float(s.get("seconds") or 0) for s in stages.values()), 3),
+        stages=stages,
+        extract_path=extract.get("extract_path"),
+        audio_cached=synth.get("audio_cached"),
+        duration_seconds=(result or {}).get("duration_seconds"),
+        cost_usd=estimate_cost(totals["llm_input_tokens"], totals["llm_output_tokens"], totals["tts_characters"]),
+        **totals,
+    )
+    with SessionLocal() as db:
+        db.merge(row)  # a retried finalize overwrites instead of failing on the primary key
+        db.commit()
+
+def _percentile(ordered: list[float], p: float) -> float | None:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))], 3)
+
+def aggregate(rows: Iterable, key: Callable) -> list[dict]:
+    """
+    Groups PipelineRun rows by key(row): latency percentiles, cost and retry/failure rates.
+    Latency covers rendered runs only; reused ones (near-zero, served from stored audio) are
+    reported on their own. Slowest groups (p95 wall time) first.
+    """
+    groups: dict[str, list] = {}
+    for row in rows:
+        groups.setdefault(key(row) or "unknown", []).append(row)
+
+    out = []
+    for name, items in groups.items():
+        done = [r for r in items if r.status != "failed"]
+        rendered = [r for r in done if r.status != "reused"]
+        wall = sorted(r.wall_seconds for r in rendered if r.wall_seconds is not None)
+        work = sorted(r.work_seconds for r in rendered if r.work_seconds is not None)
+        reused_wall = sorted(r.wall_seconds for r in done if r.status == "reused" and r.wall_seconds is not None)
+        stage_seconds: dict[str, list[float]] = {}
+        for r in rendered:
+            for stage_name, s in (r.stages or {}).items():
+                stage_seconds.setdefault(stage_name, []).append(float(s.get("seconds") or 0))
+        cost = sum(r.cost_usd or 0.0 for r in items)
+        out.append({
+            "key": name,
+            "runs": len(items),
+            "ok": sum(r.status == "ok" for r in items),
+            "reused": sum(r.status == "reused" for r in items),
+            "failed": len(items) - len(done),
+            "failure_rate": round((len(items) - len(done)) / len(items), 4),
+            "retry_rate": round(sum((r.tts_retries or 0) > 0 for r in items) / len(items), 4),
+            "wall_seconds": {"p50": _percentile(wall, 0.5), "p95": _percentile(wall, 0.95)},
+            "work_seconds": {"p50": _percentile(work, 0.5), "p95": _percentile(work, 0.95)},
+            "reused_wall_seconds": {"p50": _percentile(reused_wall, 0.5), "p95": _percentile(reused_wall, 0.95)},
+            "stage_p95_seconds": {k: _percentile(sorted(v), 0.95) for k, v in sorted(stage_seconds.items())},
+            "llm_tokens": sum((r.llm_input_tokens or 0) + (r.llm_output_tokens or 0) for r in items),
+            "tts_characters": sum(r.tts_characters or 0 for r in items),
+            "cost_usd": round(cost, 4),
+            "cost_per_run_usd": round(cost / len(items), 4),
+        })
+    out.sort(key=lambda g: g["wall_seconds"]["p95"] or 0.0, reverse=True)
+    return out
@@ -1,10 +1,23 @@
 import os
 import json
-import re
 from typing import Any, Dict, List, Optional
 from openai import OpenAI
 
-client = OpenAI()
+from app import llm_cache, ratelimit, runs
+from app.metrics import LLM_CALL_SECONDS, cache_lookup, timer
+from app.length_fit import count_words, shorten_to_range
+
+_client: OpenAI | None = None
+
+def _get_client() -> OpenAI:
+    # created on first call, so importing this module needs no API key
+    global _client
+    if _client is None:
+        # 429s are retried by app.ratelimit so every worker backs off together, not by the SDK
+        _client = OpenAI(max_retries=0)
+    return _client
+
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "4"))
 
 # --- Tuning knobs ---
 DEFAULT_TARGET_SECONDS = int(os.getenv("TTS_TARGET_SECONDS", "180"))
@@ -55,8 +68,7 @@ Return JSON only. No markdown. No extra text.
 """
 
 def _count_words(text: str) -> int:
-    tokens = re.findall(r"[A-Za-zÀ-ÖØ-öø-ÿ0-9]+(?:'[A-Za-z]+)?", text)
-    return len(tokens)
+    return count_words(text)
 
 def _is_spanish(lang: Optional[str]) -> bool:
     return bool(lang) and lang.lower().startswith("es")
@@ -77,17 +89,40 @@ def _tolerance_words(target_seconds: int, output_language: Optional[str]) -> int
     # words spoken in tolerance window (e.g., 30s)
     return int(round(TOLERANCE_SECONDS * (wpm / 60.0)))
 
-def _call_llm(system: str, user: str, model: str, temperature: float = 0.3) -> str:
-    resp = client.responses.create(
-        model=model,
-        input=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-        temperature=temperature,
-        store=False,
+def _call_llm(
+    system: str, user: str, model: str, temperature: float = 0.3, purpose: str = "other", refresh: bool = False,
+) -> str:
+    # identical prompts (retries, regenerations, duplicate articles) skip the round-trip;
+    # refresh (forced regeneration) asks the model again and overwrites the cached answer
+    cache = llm_cache.cache
+    key = llm_cache.make_key(model, system, user, temperature)
+    if cache is not None and not refresh:
+        cached = cache.get(key)
+        cache_lookup("llm", cached is not None)
+        if cached is not None:
+            runs.record(llm_cache_hits=1)
+            return cached
+
+    with timer(LLM_CALL_SECONDS, purpose=purpose):
+        resp = ratelimit.call("openai", model, lambda: _get_client().responses.create(
+            model=model,
+            input=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            temperature=temperature,
+            store=False,
+        ), retries=LLM_RETRIES)
+    usage = getattr(resp, "usage", None)
+    runs.record(
+        llm_calls=1,
+        llm_input_tokens=getattr(usage, "input_tokens", 0),
+        llm_output_tokens=getattr(usage, "output_tokens", 0),
     )
-    return (resp.output_text or "").strip()
+    text = (resp.output_text or "").strip()
+    if cache is not None and text:
+        cache.set(key, text, model)
+    return text
 
 def make_tts_script(
     title: str,
@@ -97,10 +132,12 @@ def make_tts_script(
     output_language: str = OUTPUT_LANGUAGE,
     target_words: int | None = None,
     tol_words: int | None = None,
+    refresh: bool = False,
 ) -> str:
     """
     Returns a narration-ready script aimed at ~target_seconds, always in Spanish by default.
-    Uses word-count targeting + up to 2 rewrite passes to hit range.
+    Uses word-count targeting + up to 2 fix-up passes to hit range; too-long scripts are
+    pruned locally first, the LLM is only asked to rewrite when that isn't enough.
     """
     model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     target = target_words or _target_words(target_seconds, output_language)
@@ -119,13 +156,19 @@ Length requirement:
 - Target word count: {target} words (acceptable range {target - tol} to {target + tol} words).
 """
 
-    script = _call_llm(SYSTEM_SCRIPT, prompt, model=model, temperature=0.3)
+    script = _call_llm(SYSTEM_SCRIPT, prompt, model=model, temperature=0.3, purpose="script", refresh=refresh)
     wc = _count_words(script)
 
     for _ in range(2):
         if (target - tol) <= wc <= (target + tol):
             break
 
+        if wc > (target + tol):
+            fitted = shorten_to_range(script, target - tol, target + tol)
+            if fitted:
+                script, wc = fitted, _count_words(fitted)
+                continue
+
         direction = "shorten" if wc > (target + tol) else "expand"
         rewrite_prompt = f"""Please {direction} the following Spanish TTS script to fit the target word count range.
 
@@ -136,7 +179,9 @@ Keep it natural spoken narration. End with the brief medical disclaimer in Spani
 SCRIPT:
 {script}
 """
-        script = _call_llm(SYSTEM_REWRITE, rewrite_prompt, model=model, temperature=0.2)
+        script = _call_llm(
+            SYSTEM_REWRITE, rewrite_prompt, model=model, temperature=0.2, purpose="rewrite", refresh=refresh,
+        )
         wc = _count_words(script)
 
     return script.strip()
@@ -147,6 +192,7 @@ def make_storyboard(
     language_hint: str | None = None,
     n_scenes: int = DEFAULT_SCENES,
     image_prompt_language: str = IMAGE_PROMPT_LANGUAGE,
+    refresh: bool = False,
 ) -> List[Dict[str, Any]]:
     """
     Returns a list of scenes with image prompts aligned to the narration.
@@ -173,7 +219,7 @@ SCRIPT:
 {script}
 """.strip()
 
-    raw = _call_llm(SYSTEM_STORYBOARD, user, model=model, temperature=0.2)
+    raw = _call_llm(SYSTEM_STORYBOARD, user, model=model, temperature=0.2, purpose="storyboard", refresh=refresh)
     try:
         data = json.loads(raw)
         if isinstance(data, list):
@@ -191,6 +237,7 @@ def make_tts_bundle(
     output_language: str = OUTPUT_LANGUAGE,
     target_words: int | None = None,
     tol_words: int | None = None,
+    refresh: bool = False,
 ) -> Dict[str, Any]:
     """
     Convenience: script + metadata + storyboard in one call.
@@ -202,10 +249,11 @@ def make_tts_bundle(
         output_language=output_language,
         target_words=target_words,
         tol_words=tol_words,
+        refresh=refresh,
     )
     wc = _count_words(script)
     est = _estimate_seconds(wc, output_language)
-    scenes = make_storyboard(title, script, language_hint=language_hint, n_scenes=n_scenes)
+    scenes = make_storyboard(title, script, language_hint=language_hint, n_scenes=n_scenes, refresh=refresh)
 
     return {
         "script": script,
@@ -219,7 +267,13 @@ def make_tts_bundle(
 def _words_for_seconds(seconds: int, wpm: float) -> int:
     return int(round(seconds * (wpm / 60.0)))
 
-def rewrite_to_target_words(script: str, target_words: int, tol_words: int = 10) -> str:
+def rewrite_to_target_words(script: str, target_words: int, tol_words: int = 10, refresh: bool = False) -> str:
+    # shortening rarely needs a model: drop sentences locally when we can
+    if _count_words(script) > target_words + tol_words:
+        fitted = shorten_to_range(script, target_words - tol_words, target_words + tol_words)
+        if fitted:
+            return fitted
+
     model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     prompt = f"""Rewrite this Spanish TTS script to fit the word count range.
 
@@ -230,4 +284,4 @@ Keep it natural spoken narration. End with the brief medical disclaimer in Spani
 SCRIPT:
 {script}
 """
-    return _call_llm(SYSTEM_REWRITE, prompt, model=model, temperature=0.2)
+    return _call_llm(SYSTEM_REWRITE, prompt, model=model, temperature=0.2, purpose="fit_duration", refresh=refresh)
@@ -1,32 +1,29 @@
 import os
+import time
 import tempfile
 import feedparser
 import logging
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from celery import Celery
 from sqlalchemy import select
+from celery.signals import worker_init, worker_process_shutdown
 from sqlalchemy.exc import IntegrityError
 
 from mutagen.mp3 import MP3  # pip install mutagen
 
-from app.db import SessionLocal, engine
-from app.models import Base, Source, Article, AudioAsset, VoiceCalibration
-from app.extract import extract_article_text
-from app.summarize import make_tts_bundle, rewrite_to_target_words  # add helper in summarize.py
-from app.tts import synthesize
+from app.db import SessionLocal
+from app.models import Source, Article, AudioAsset, AudioBlob, VoiceCalibration
+from app.extract import extract_article_text, extract_many
+from app.feeds import FeedFetch, FeedSource, fetch_all
+from app.summarize import make_tts_script, make_storyboard, rewrite_to_target_words  # add helper in summarize.py
+from app.tts import DurationExceeded, render_key, synthesize_to_file
+from app.duration import DURATION_MIN_SAMPLES, load_estimator, record_duration
+from app import audio_cache, events, metrics, runs
+from app.celery_app import TARGET_SECONDS, celery_app, generate_pipeline, initial_state  # noqa: F401 (re-exported)
 
 logger = logging.getLogger(__name__)
 
-celery_app = Celery(
-    "mvp",
-    broker=os.environ["CELERY_BROKER_URL"],
-    backend=os.environ["CELERY_RESULT_BACKEND"],
-)
-
-Base.metadata.create_all(bind=engine)
-
-TARGET_SECONDS = int(os.getenv("TTS_TARGET_SECONDS", "180"))
 TOLERANCE_SECONDS = int(os.getenv("TTS_TOLERANCE_SECONDS", "30"))  # +/-30s
 WAY_OFF_SECONDS = int(os.getenv("TTS_WAY_OFF_SECONDS", "15"))      # only retry if >15s outside window
 CAL_ALPHA = float(os.getenv("TTS_CAL_ALPHA", "0.3"))              # EMA
@@ -34,6 +31,12 @@ MAX_TTS_ATTEMPTS = int(os.getenv("TTS_MAX_ATTEMPTS", "2"))        # keep it 2 to
 MIN_SECONDS = int(os.getenv("TTS_DURATION_MIN_SECONDS", "150"))
 MAX_SECONDS = int(os.getenv("TTS_DURATION_MAX_SECONDS", "210"))
 
+# in-process runner only: storyboard LLM calls run next to the TTS attempts instead of before them
+_storyboard_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("STORYBOARD_THREADS", "2")),
+    thread_name_prefix="storyboard",
+)
+
 def _parse_dt(entry) -> datetime | None:
     for k in ("published_parsed", "updated_parsed"):
         t = getattr(entry, k, None)
@@ -51,180 +54,665 @@ def _speed_key(speed: float) -> float:
     # avoid float equality issues in composite PK
     return round(speed, 2)
 
+def _duration_window(target_seconds: int) -> tuple[int, int]:
+    """MIN/MAX_SECONDS around the default target, shifted to follow a custom one."""
+    shift = target_seconds - TARGET_SECONDS
+    return MIN_SECONDS + shift, MAX_SECONDS + shift
+
+def _entry_articles(source_id: str, entries) -> dict[str, Article]:
+    """One unsaved Article per distinct entry link, in feed order (dates parsed once, here)."""
+    rows: dict[str, Article] = {}
+    for e in entries:
+        url = (e.get("link") or "").strip()
+        if not url or url in rows:
+            continue
+        title = (e.get("title") or "").strip() or "Untitled"
+        summary = (e.get("summary") or e.get("description") or "").strip() or None
+        rows[url] = Article(
+            source_id=source_id, title=title, url=url, published_at=_parse_dt(e), summary=summary,
+        )
+    return rows
+
+def _add_unknown_articles(db, source_id: str, rows: dict[str, Article]) -> tuple[list[Article], set[str]]:
+    """Adds the rows not stored yet; also returns the URLs already processed (tts_script set)."""
+    if not rows:
+        return [], set()
+
+    # one round-trip to find what we already have
+    known = dict(db.execute(
+        select(Article.url, Article.tts_script.is_not(None))
+        .where(Article.source_id == source_id, Article.url.in_(list(rows)))
+    ).all())
+    new = [a for url, a in rows.items() if url not in known]
+    db.add_all(new)
+    return new, {url for url, processed in known.items() if processed}
+
+def _insert_new_articles(db, source_id: str, entries) -> list[Article]:
+    return _add_unknown_articles(db, source_id, _entry_articles(source_id, entries))[0]
+
+def _pick_entry(rows: dict[str, Article], processed: set[str], cutoff: datetime) -> Article:
+    """
+    Newest entry inside the lookback window that hasn't been processed yet. When every recent
+    entry has been, the newest one (its audio is most likely reusable), else the feed's first.
+    """
+    recent = sorted(
+        (a for a in rows.values() if a.published_at and a.published_at >= cutoff),
+        key=lambda a: a.published_at, reverse=True,
+    )
+    for a in recent:
+        if a.url not in processed:
+            return a
+    return recent[0] if recent else next(iter(rows.values()))
+
+def _feed_source(src: Source) -> FeedSource:
+    return FeedSource(
+        source_id=src.id,
+        url=src.rss_url,
+        etag=src.etag,
+        last_modified=src.last_modified,
+        content_hash=src.content_hash,
+    )
+
+def _store_validators(src: Source, fetched: FeedFetch) -> None:
+    src.etag = fetched.etag
+    src.last_modified = fetched.last_modified
+    src.content_hash = fetched.content_hash
+    src.last_fetched_at = datetime.utcnow()
+
+def _ready_audio(
+    db, article_id: str, voice_id: str, model_id: str, output_format: str, target_seconds: int,
+) -> AudioAsset | None:
+    audio = db.execute(
+        select(AudioAsset)
+        .where(
+            AudioAsset.article_id == article_id,
+            AudioAsset.voice_id == voice_id,
+            AudioAsset.model_id == model_id,
+            AudioAsset.output_format == output_format,
+            AudioAsset.target_seconds == target_seconds,
+            AudioAsset.status == "ready",
+        )
+        .order_by(AudioAsset.created_at.desc())
+        .limit(1)
+    ).scalar_one_or_none()
+    if audio and os.path.exists(audio.file_path):
+        return audio
+    return None
 
-@celery_app.task(name="generate_latest_for_source")
-def generate_latest_for_source(
-    source_id: str,
-    voice_id: str | None = None,
-    target_seconds: int = TARGET_SECONDS,
-    n_scenes: int = 8,
-) -> dict:
-    audio_dir = os.getenv("AUDIO_DIR", "/data/audio")
-    os.makedirs(audio_dir, exist_ok=True)
+def _stored_scenes(article: Article, n_scenes: int) -> list | None:
+    scenes = (article.storyboard_json or {}).get("scenes")
+    if scenes is None or len(scenes) != n_scenes:
+        return None
+    return scenes
+
+def _lookback_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(days=int(os.getenv("RSS_LOOKBACK_DAYS", "7")))
+
+def _stored_window_articles(db, source_id: str, cutoff: datetime) -> dict[str, Article]:
+    # entries stored by an earlier poll (or ingest_all_sources), keyed by URL like _entry_articles
+    articles = db.execute(
+        select(Article)
+        .where(Article.source_id == source_id, Article.published_at >= cutoff)
+        .order_by(Article.published_at.desc(), Article.created_at.desc())
+    ).scalars()
+    return {a.url: a for a in articles}
+
+def _latest_processed_article(db, source_id: str) -> Article | None:
+    # what the previous run selected from this (unchanged) feed
+    return db.execute(
+        select(Article)
+        .where(Article.source_id == source_id, Article.tts_script.is_not(None))
+        .order_by(Article.published_at.desc().nulls_last(), Article.created_at.desc())
+        .limit(1)
+    ).scalar_one_or_none()
+
+
+@celery_app.task(name="ingest_all_sources")
+def ingest_all_sources(extract: bool = True) -> dict:
+    started = time.perf_counter()
+
+    # don't hold a DB connection while the feeds download
+    with SessionLocal() as db:
+        feeds = [_feed_source(s) for s in db.execute(select(Source)).scalars()]
+
+    fetched = fetch_all(feeds)
+
+    report = []
+    to_extract: dict[str, tuple[str, str | None]] = {}  # article id -> (url, fallback)
+    with SessionLocal() as db:
+        for f in fetched:
+            item = {
+                "source_id": f.source_id,
+                "status_code": f.status_code,
+                "elapsed_ms": f.elapsed_ms,
+                "not_modified": f.not_modified,
+                "entries": 0,
+                "new_articles": 0,
+                "error": f.error,
+            }
+            report.append(item)
+            if f.error:
+                continue
+
+            src = db.get(Source, f.source_id)
+            if f.not_modified:
+                _store_validators(src, f)
+                db.commit()
+                continue
+
+            parsed = feedparser.parse(f.content, response_headers={"content-type": f.content_type or ""})
+            item["entries"] = len(parsed.entries)
+            try:
+                new = _insert_new_articles(db, f.source_id, parsed.entries)
+                # validators are only saved together with the rows they describe
+                _store_validators(src, f)
+                db.commit()
+            except IntegrityError as e:
+                # a concurrent generate_latest_for_source won the insert race
+                db.rollback()
+                item["error"] = f"IntegrityError: {e.orig}"
+                continue
+            item["new_articles"] = len(new)
+            to_extract.update((a.id, (a.url, a.summary)) for a in new)
+
+    extracted_ms = 0
+    if extract and to_extract:
+        # extraction runs without a DB session; results are written in one go
+        extract_started = time.perf_counter()
+        ids_by_url = {}
+        for article_id, (url, _) in to_extract.items():
+            ids_by_url.setdefault(url, []).append(article_id)
+        texts = dict(extract_many((url, fallback) for url, fallback in to_extract.values()))
+        with SessionLocal() as db:
+            for url, text in texts.items():
+                for article_id in ids_by_url[url]:
+                    db.get(Article, article_id).raw_text = text or None
+            db.commit()
+        extracted_ms = int((time.perf_counter() - extract_started) * 1000)
+
+    errors = sum(1 for item in report if item["error"])
+    elapsed_ms = int((time.perf_counter() - started) * 1000)
+    slowest = max(report, key=lambda item: item["elapsed_ms"], default=None)
+    logger.info(
+        "Ingested %s feeds in %sms (errors=%s, slowest=%s %sms)",
+        len(report), elapsed_ms, errors,
+        slowest and slowest["source_id"], slowest and slowest["elapsed_ms"],
+    )
+
+    return {
+        "feeds": report,
+        "sources": len(report),
+        "not_modified": sum(1 for item in report if item["not_modified"]),
+        "errors": errors,
+        "new_articles": sum(item["new_articles"] for item in report),
+        "extracted": len(to_extract) if extract else 0,
+        "extract_ms": extracted_ms,
+        "elapsed_ms": elapsed_ms,
+    }
+
+
+@worker_init.connect
+def _start_metrics_exporter(**_):
+    if metrics.METRICS_PORT:  # METRICS_PORT=0 turns the exporter off
+        metrics.start_worker_exporter()
+
+@worker_process_shutdown.connect
+def _forget_process_metrics(pid=None, **_):
+    metrics.mark_process_dead(pid or os.getpid())
+
+class _ProgressTask(celery_app.Task):
+    """Publishes the terminal job event for tasks whose return value is the job result."""
+
+    def on_success(self, retval, task_id, args, kwargs):
+        events.publish(
+            task_id, "done",
+            audio_id=retval.get("audio_id"),
+            duration_seconds=retval.get("duration_seconds"),
+            reused=bool(retval.get("reused")),
+        )
 
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        events.publish(task_id, "failed", error=str(exc))
+        if args and isinstance(args[0], list):  # stage_finalize; the in-process runner records its own
+            runs.finish(runs.merge(args[0]), error=exc)
+
+class _StageTask(celery_app.Task):
+    """A step of the staged pipeline: failures are reported against the job, not just the step."""
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        state = args[0] if args and isinstance(args[0], dict) else {}
+        if args and isinstance(args[0], list):  # stage_restoryboard gets both branches
+            state = runs.merge(args[0])
+        job_id = state.get("job_id")
+        if job_id:
+            runs.finish(state, error=exc)
+        if job_id and job_id != task_id:
+            events.publish(job_id, "failed", error=str(exc), stage=self.name)
+            # later links never run; make the job id (the final task) report the failure
+            self.backend.mark_as_failure(job_id, exc, call_errbacks=False)
+
+def _progress(state: dict, stage: str, **data) -> None:
+    """Stage event for SSE subscribers, mirrored as a PROGRESS state on the job for pollers."""
+    job_id = state.get("job_id")
+    if not job_id:
+        return  # called directly, not through a worker
+    data["source_id"] = state["source_id"]
+    events.publish(job_id, stage, **data)
+    celery_app.backend.store_result(job_id, {"stage": stage, **data}, "PROGRESS")
+
+# Pipeline state: a JSON dict handed from stage to stage. Big texts stay in the DB (article row).
+
+@runs.stage("fetch")
+def _stage_fetch(state: dict) -> dict:
+    """Conditional feed fetch, entry selection and article upsert; short-circuits on ready audio."""
+    source_id = state["source_id"]
+
+    # choose voice/model EARLY so we can pick the right calibration
+    used_voice_id = state.get("voice_id") or os.getenv("ELEVENLABS_VOICE_ID")
+    if not used_voice_id:
+        raise RuntimeError("Missing ELEVENLABS_VOICE_ID")
+    state.update(
+        voice_id=used_voice_id,
+        model_id=os.getenv("ELEVENLABS_MODEL_ID", "eleven_multilingual_v2"),
+        output_format=os.getenv("ELEVENLABS_OUTPUT_FORMAT", "mp3_44100_128"),
+        speed=_speed_key(float(os.getenv("ELEVENLABS_SPEED", "1.0"))),
+        output_language=os.getenv("TTS_OUTPUT_LANGUAGE", "es-MX"),
+    )
+
+    # don't hold a DB connection while the feed downloads
     with SessionLocal() as db:
         src = db.get(Source, source_id)
         if not src:
             raise ValueError(f"Unknown source_id: {source_id}")
+        feed_source = _feed_source(src)
+    fetched = fetch_all([feed_source])[0]
 
-        feed = feedparser.parse(src.rss_url)
-        if not feed.entries:
-            raise RuntimeError("No RSS entries found")
-
-        lookback_days = int(os.getenv("RSS_LOOKBACK_DAYS", "7"))
-        cutoff = datetime.utcnow() - timedelta(days=lookback_days)
-
-        def _dt(e):
-            return _parse_dt(e)  # your existing helper
+    with SessionLocal() as db:
+        src = db.get(Source, source_id)
+        article = None
+        if fetched.not_modified:
+            # feed unchanged: its entries are already stored, so pick among the rows the same way
+            # a fresh feed would; nothing inside the window -> reuse the last processed article
+            cutoff = _lookback_cutoff()
+            rows = _stored_window_articles(db, src.id, cutoff)
+            if rows:
+                processed = {url for url, a in rows.items() if a.tts_script is not None}
+                article = _pick_entry(rows, processed, cutoff)
+            else:
+                article = _latest_processed_article(db, src.id)
+            if article is None:
+                # validators outlived the rows they describe; fetch unconditionally
+                fetched = fetch_all([FeedSource(source_id=src.id, url=src.rss_url)])[0]
+        if fetched.error:
+            raise RuntimeError(f"RSS fetch failed: {fetched.error}")
+        _progress(state, "feed_fetched", not_modified=fetched.not_modified, elapsed_ms=fetched.elapsed_ms)
+
+        if article is not None:
+            _store_validators(src, fetched)
+            db.commit()
+            fallback = article.summary or ""
+            logger.info(
+                "Feed not modified, selected stored article: title=%r url=%s processed=%s",
+                article.title, article.url, article.tts_script is not None,
+            )
+        else:
+            feed = feedparser.parse(
+                fetched.content, response_headers={"content-type": fetched.content_type or ""}
+            )
+            if not feed.entries:
+                raise RuntimeError("No RSS entries found")
 
-        # prefer items inside window
-        candidates = [e for e in feed.entries if _dt(e) and _dt(e) >= cutoff]
-        entry = candidates[0] if candidates else feed.entries[0]
-        title = (entry.get("title") or "").strip() or "Untitled"
-        url = (entry.get("link") or "").strip()
-        if not url:
-            raise RuntimeError("RSS entry has no link/url")
-        fallback = (entry.get("summary") or entry.get("description") or "").strip()
-        published_at = _parse_dt(entry)
+            rows = _entry_articles(src.id, feed.entries)
+            if not rows:
+                raise RuntimeError("RSS entry has no link/url")
 
-        logger.info("Selected RSS entry: title=%r published_at=%s url=%s", title, published_at, url)
+            # record every entry so the validators stay in sync with `articles`
+            processed: set[str] = set()
+            try:
+                _, processed = _add_unknown_articles(db, src.id, rows)
+                _store_validators(src, fetched)
+                db.commit()
+            except IntegrityError:
+                # raced with ingest_all_sources; leave validators stale so the next poll refetches
+                db.rollback()
+
+            entry = _pick_entry(rows, processed, _lookback_cutoff())
+            title, url, published_at = entry.title, entry.url, entry.published_at
+            fallback = entry.summary or ""
+
+            logger.info(
+                "Selected RSS entry: title=%r published_at=%s url=%s (%d of %d entries already processed)",
+                title, published_at, url, len(processed), len(rows),
+            )
 
-        # upsert article
-        article = Article(source_id=src.id, title=title, url=url, published_at=published_at)
-        db.add(article)
-        try:
-            db.commit()
-        except IntegrityError:
-            db.rollback()
+            # upsert article
             article = db.execute(
                 select(Article).where(Article.source_id == src.id, Article.url == url)
-            ).scalar_one()
-
-        # extract
-        raw = extract_article_text(url, fallback_text=fallback)
-        if not raw:
-            raw = fallback or title
-
-        # choose voice/model EARLY so we can pick the right calibration
-        used_voice_id = voice_id or os.getenv("ELEVENLABS_VOICE_ID")
-        if not used_voice_id:
-            raise RuntimeError("Missing ELEVENLABS_VOICE_ID")
-        model_id = os.getenv("ELEVENLABS_MODEL_ID", "eleven_multilingual_v2")
-        output_format = os.getenv("ELEVENLABS_OUTPUT_FORMAT", "mp3_44100_128")
-        speed = float(os.getenv("ELEVENLABS_SPEED", "1.0"))
-        speed = _speed_key(speed)
+            ).scalar_one_or_none()
+            if article is None:
+                article = Article(
+                    source_id=src.id, title=title, url=url, published_at=published_at, summary=fallback or None,
+                )
+                db.add(article)
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                    article = db.execute(
+                        select(Article).where(Article.source_id == src.id, Article.url == url)
+                    ).scalar_one()
+
+        state.update(
+            article_id=article.id,
+            title=article.title,
+            url=article.url,
+            fallback=fallback,
+            language_hint=src.language_hint,
+        )
+
+        # same article, voice and length already rendered: nothing to pay for
+        if not state["force"]:
+            audio = _ready_audio(
+                db, article.id, used_voice_id, state["model_id"], state["output_format"], state["target_seconds"],
+            )
+            metrics.cache_lookup("audio_asset", audio is not None)
+            if audio:
+                logger.info("Reusing audio %s for article %s", audio.id, article.id)
+                state["result"] = {
+                    "source_id": source_id,
+                    "article_id": article.id,
+                    "audio_id": audio.id,
+                    "audio_path": audio.file_path,
+                    "duration_seconds": audio.estimated_seconds,
+                    "word_count": audio.word_count,
+                    "title": article.title,
+                    "url": article.url,
+                    "scenes": (article.storyboard_json or {}).get("scenes") or [],
+                    "reused": True,
+                }
+    return state
+
+@runs.stage("extract")
+def _stage_extract(state: dict) -> dict:
+    if state.get("result"):
+        return state
+
+    with SessionLocal() as db:
+        raw = db.get(Article, state["article_id"]).raw_text
+    if not raw or state["force"]:
+        raw = extract_article_text(state["url"], fallback_text=state["fallback"], refresh=state["force"])
+    else:
+        runs.note(extract_path="stored")
+    if not raw:
+        raw = state["fallback"] or state["title"]
+
+    with SessionLocal() as db:
+        db.get(Article, state["article_id"]).raw_text = raw
+        db.commit()
+    _progress(state, "extracted", article_id=state["article_id"], chars=len(raw))
+    return state
+
+@runs.stage("summarize")
+def _stage_summarize(state: dict) -> dict:
+    """Script within the word budget for this voice; the duration predictor vets it before TTS."""
+    if state.get("result"):
+        return state
+    voice_id, model_id, speed = state["voice_id"], state["model_id"], state["speed"]
+    output_language = state["output_language"]
+    target_seconds = state["target_seconds"]
+
+    with SessionLocal() as db:
+        article = db.get(Article, state["article_id"])
+        raw = article.raw_text
 
         # fetch calibration (default WPM if no samples yet)
-        cal = db.get(VoiceCalibration, (used_voice_id, model_id, speed))
+        cal = db.get(VoiceCalibration, (voice_id, model_id, speed))
         wpm = cal.wpm_estimate if cal else 140.0  # Spanish baseline
+        estimator = load_estimator(db, voice_id, model_id, speed, output_language, wpm)
 
         target_words = _words_for_seconds(target_seconds, wpm)
         tol_words = _words_for_seconds(TOLERANCE_SECONDS, wpm)
 
-        # summarize + storyboard (Spanish output is enforced by summarize.py env TTS_OUTPUT_LANGUAGE)
-        bundle = make_tts_bundle(
-            title=title,
-            body=raw,
-            language_hint=src.language_hint,
+        # an existing script is good if it is in the right language and length window
+        script = article.tts_script if not state["force"] else None
+        if script and (
+            article.script_language != output_language
+            or abs(len(script.split()) - target_words) > tol_words
+        ):
+            script = None
+        scenes = _stored_scenes(article, state["n_scenes"]) if script else None
+
+    summary_model = None
+    if script:
+        logger.info("Reusing script words=%s for article %s", len(script.split()), state["article_id"])
+    else:
+        # summarize (Spanish output is enforced by summarize.py env TTS_OUTPUT_LANGUAGE)
+        script = make_tts_script(
+            state["title"],
+            raw,
+            language_hint=state["language_hint"],
             target_seconds=target_seconds,
-            n_scenes=n_scenes,
             target_words=target_words,
             tol_words=tol_words,
+            refresh=state["force"],
         )
-
-        script = bundle["script"]
-        scenes = bundle.get("scenes") or []
-        word_count = bundle.get("word_count")
-
-        logger.info("Final script words=%s preview=%r", word_count, script[:400])
-
-        # store article artifacts
-        article.raw_text = raw
+        summary_model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    word_count = len(script.split())
+
+    # pre-synthesis gate: a confident predictor can reject a script before ElevenLabs bills for it
+    min_seconds, max_seconds = _duration_window(target_seconds)
+    predicted = estimator.predict(script)
+    if estimator.samples >= DURATION_MIN_SAMPLES and not (min_seconds <= predicted <= max_seconds):
+        target_wc = int(round(word_count * target_seconds / max(predicted, 1.0)))
+        logger.info("Predicted %.0fs for %s words, rewriting to %s words", predicted, word_count, target_wc)
+        script = rewrite_to_target_words(script, target_words=target_wc, tol_words=tol_words, refresh=state["force"])
+        word_count = len(script.split())
+        scenes = None
+
+    logger.info("Final script words=%s preview=%r", word_count, script[:400])
+
+    # store article artifacts
+    with SessionLocal() as db:
+        article = db.get(Article, state["article_id"])
         article.tts_script = script
-        article.script_language = os.getenv("TTS_OUTPUT_LANGUAGE", "es-MX")
-        article.summary_model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-        if hasattr(article, "storyboard_json"):
-            article.storyboard_json = {"scenes": scenes}
+        article.script_language = output_language
+        if summary_model:
+            article.summary_model = summary_model
         db.commit()
 
-        final_path = os.path.join(audio_dir, f"{article.id}_{used_voice_id}.mp3")
+    _progress(state, "script_ready", words=word_count, predicted_seconds=round(estimator.predict(script)))
+    state.update(script=script, word_count=word_count, wpm=wpm, scenes=scenes)
+    return state
+
+@runs.stage("storyboard")
+def _stage_storyboard(state: dict) -> dict:
+    # doesn't depend on the audio: runs next to the synthesis
+    if not state.get("result") and state.get("scenes") is None:
+        state["scenes"] = make_storyboard(
+            state["title"], state["script"], language_hint=state["language_hint"], n_scenes=state["n_scenes"],
+            refresh=state["force"],
+        )
+    return state
+
+def _storyboard_stale(states: list[dict]) -> bool:
+    board, synth = states
+    return not synth.get("result") and board["script"] != synth["script"]
+
+@runs.stage("restoryboard")
+def _stage_restoryboard(states: list[dict]) -> list[dict]:
+    """TTS rewrote the narration after the storyboard started: rebuilds the scenes from the final script."""
+    board, synth = states
+    scenes = make_storyboard(
+        synth["title"], synth["script"], language_hint=synth["language_hint"], n_scenes=synth["n_scenes"],
+        refresh=synth["force"],
+    )
+    return [{**board, "script": synth["script"], "scenes": scenes}, synth]
+
+@runs.stage("synthesize")
+def _stage_synthesize(state: dict) -> dict:
+    """TTS attempts until one lands in the duration window; the accepted file goes to the audio cache."""
+    if state.get("result"):
+        return state
+    audio_dir = os.getenv("AUDIO_DIR", "/data/audio")
+    os.makedirs(audio_dir, exist_ok=True)
 
-        duration = None
-        last_error = None
+    voice_id, model_id, speed = state["voice_id"], state["model_id"], state["speed"]
+    output_format, output_language = state["output_format"], state["output_language"]
+    target_seconds, wpm = state["target_seconds"], state["wpm"]
+    script, word_count = state["script"], state["word_count"]
 
-        accept_min = MIN_SECONDS - WAY_OFF_SECONDS
-        accept_max = MAX_SECONDS + WAY_OFF_SECONDS
+    with SessionLocal() as db:
+        estimator = load_estimator(db, voice_id, model_id, speed, output_language, wpm)
 
-        for attempt in range(1, MAX_TTS_ATTEMPTS + 1):
-            try:
-                audio_bytes = synthesize(script, voice_id=used_voice_id,
-                                         model_id=model_id, output_format=output_format)
+    duration = None
+    last_error = None
+    blob = None
+    cached = False
 
-                # write safely then move into place
+    min_seconds, max_seconds = _duration_window(target_seconds)
+    accept_min = min_seconds - WAY_OFF_SECONDS
+    accept_max = max_seconds + WAY_OFF_SECONDS
+
+    for attempt in range(1, MAX_TTS_ATTEMPTS + 1):
+        tmp_path = None
+        try:
+            # identical script and settings rendered before: reuse it, zero characters billed.
+            # A forced job renders anyway; the new file is stored next to the cached one.
+            key = render_key(script, voice_id, model_id=model_id, output_format=output_format)
+            if state["force"]:
+                blob = None
+            else:
+                with SessionLocal() as db:
+                    blob = audio_cache.lookup(db, key)
+                    db.commit()
+                metrics.cache_lookup("audio", blob is not None)
+            cached = blob is not None
+            runs.record(tts_renders=1)
+            runs.note(audio_cached=cached)
+            if cached:
+                duration = blob.duration_seconds
+                logger.info("TTS attempt %s served from audio cache %s", attempt, key)
+            else:
+                # stream straight into a temp file, then move into place
                 with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3", dir=audio_dir) as tmp:
-                    tmp.write(audio_bytes)
                     tmp_path = tmp.name
 
-                duration = _mp3_duration_seconds(tmp_path)
-
-                # Accept if within window -> atomic rename works now (same filesystem)
-                if accept_min <= duration <= accept_max:
-                    os.replace(tmp_path, final_path)
-                    break
-
-                # accept if within soft window
-                if accept_min <= duration <= accept_max:
-                    os.replace(tmp_path, final_path)
-                    break
+                try:
+                    seconds = synthesize_to_file(
+                        script, tmp_path, voice_id=voice_id,
+                        model_id=model_id, output_format=output_format,
+                        max_seconds=accept_max,  # no point paying to hear the rest
+                    )
+                    # frame counting only understands MP3; let mutagen have a go otherwise
+                    duration = int(round(seconds)) if seconds else _mp3_duration_seconds(tmp_path)
+                    with SessionLocal() as db:
+                        estimator = record_duration(
+                            db, script, duration, voice_id, model_id, speed, output_language, wpm,
+                        )
+                        db.commit()
+                except DurationExceeded as e:
+                    # e.seconds is only a lower bound; the predictor says how long it would have run
+                    duration = max(int(round(e.seconds)), int(round(estimator.predict(script))))
+                    logger.info("TTS attempt %s cut off at %.0fs (max %ss)", attempt, e.seconds, accept_max)
+
+            accepted = accept_min <= duration <= accept_max
+            _progress(
+                state, "tts_attempt",
+                attempt=attempt, duration_seconds=duration, accepted=accepted, cached=cached,
+            )
 
-                # if this was the last attempt, keep tmp for debugging or delete it and fall through
-                if attempt >= MAX_TTS_ATTEMPTS:
+            if not accepted:
+                metrics.TTS_DURATION_REJECTIONS.inc()
+
+            # Accept if within window -> atomic rename into the cache works (same filesystem)
+            if accepted:
+                if blob is None:
+                    with SessionLocal() as db:
+                        blob = audio_cache.store(db, key, tmp_path, duration, output_format)
+                        db.commit()
+                break
+            blob = None
+
+            # if this was the last attempt, keep tmp for debugging or delete it and fall through
+            if attempt >= MAX_TTS_ATTEMPTS:
+                if tmp_path:
                     try:
                         os.remove(tmp_path)
                     except Exception:
                         pass
-                    break
-
-                # rewrite for next attempt
-                wc = word_count or len(script.split())
-                desired = target_seconds
-                if duration < MIN_SECONDS:
-                    desired = MIN_SECONDS
-                elif duration > MAX_SECONDS:
-                    desired = MAX_SECONDS
-
-                target_wc = int(round(wc * (desired / max(duration, 1))))
-                script = rewrite_to_target_words(script, target_words=target_wc, tol_words=20)
-                word_count = len(script.split())
-
+                break
+
+            # rewrite for next attempt
+            wc = word_count or len(script.split())
+            desired = target_seconds
+            if duration < min_seconds:
+                desired = min_seconds
+            elif duration > max_seconds:
+                desired = max_seconds
+
+            target_wc = int(round(wc * (desired / max(duration, 1))))
+            script = rewrite_to_target_words(script, target_words=target_wc, tol_words=20, refresh=state["force"])
+            word_count = len(script.split())
+            metrics.TTS_RETRIES.labels("duration").inc()
+            runs.record(tts_retries=1)
+
+            if tmp_path:
                 try:
                     os.remove(tmp_path)
                 except Exception:
                     pass
 
-            except Exception as e:
-                last_error = str(e)
-                duration = None
+        except Exception as e:
+            last_error = str(e)
+            duration = None
+            blob = None
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    if blob is None or duration is None or not (accept_min <= duration <= accept_max):
+        # mark failure or at least surface the error
+        raise RuntimeError(f"TTS out of range after retries. duration={duration}, error={last_error}")
+
+    state.update(
+        script=script,
+        word_count=word_count,
+        audio={"key": blob.key, "duration_seconds": duration, "cached": cached},
+    )
+    return state
+
+@runs.stage("finalize")
+def _stage_finalize(states: list[dict]) -> dict:
+    """Joins the storyboard and synthesis branches: calibration, AudioAsset row, job result."""
+    board, synth = states
+    if synth.get("result"):
+        return synth["result"]
+
+    script, word_count = synth["script"], synth["word_count"]
+    duration, cached = synth["audio"]["duration_seconds"], synth["audio"]["cached"]
+    voice_id, model_id, speed = synth["voice_id"], synth["model_id"], synth["speed"]
+
+    scenes = board["scenes"]
+
+    with SessionLocal() as db:
+        article = db.get(Article, synth["article_id"])
+        blob = db.get(AudioBlob, synth["audio"]["key"])
 
-        accept_min = MIN_SECONDS - WAY_OFF_SECONDS
-        accept_max = MAX_SECONDS + WAY_OFF_SECONDS
-        if duration is None or not (accept_min <= duration <= accept_max):
-            # mark failure or at least surface the error
-            raise RuntimeError(f"TTS out of range after retries. duration={duration}, error={last_error}")
         article.tts_script = script
+        if hasattr(article, "storyboard_json"):
+            article.storyboard_json = {"scenes": scenes or []}
         observed_wpm = (word_count / max(duration, 1)) * 60.0
 
-        cal = db.get(VoiceCalibration, (used_voice_id, model_id, speed))
+        cal = db.get(VoiceCalibration, (voice_id, model_id, speed))
         if not cal:
             cal = VoiceCalibration(
-                voice_id=used_voice_id,
+                voice_id=voice_id,
                 model_id=model_id,
                 speed=speed,
                 wpm_estimate=observed_wpm,
                 samples=1,
             )
             db.add(cal)
-        else:
+        elif not cached:  # a cached rendering was already counted when it was made
             cal.wpm_estimate = (1 - CAL_ALPHA) * cal.wpm_estimate + CAL_ALPHA * observed_wpm
             cal.samples += 1
 
@@ -233,16 +721,20 @@ def generate_latest_for_source(
         # DB record for audio
         audio = AudioAsset(
             article_id=article.id,
-            voice_id=used_voice_id,
+            voice_id=voice_id,
             model_id=model_id,
-            output_format=output_format,
-            file_path=final_path,
+            output_format=synth["output_format"],
+            file_path=blob.file_path,
+            audio_key=blob.key,
+            content_hash=blob.content_hash,
+            size_bytes=blob.size_bytes,
+            script_text=script,
             tts_provider="elevenlabs",
         )
 
         # If you added these fields in models.py, fill them:
         if hasattr(audio, "target_seconds"):
-            audio.target_seconds = target_seconds
+            audio.target_seconds = synth["target_seconds"]
         if hasattr(audio, "estimated_seconds"):
             audio.estimated_seconds = duration
         if hasattr(audio, "word_count"):
@@ -251,11 +743,19 @@ def generate_latest_for_source(
             audio.status = "ready"
 
         db.add(audio)
+        audio_cache.acquire(db, blob)
         db.commit()
 
-        logger.info("Saved audio duration=%ss path=%s", duration, final_path)
+        logger.info("Saved audio duration=%ss path=%s cached=%s", duration, blob.file_path, cached)
+
+        try:
+            audio_cache.evict(db)
+        except Exception:
+            db.rollback()
+            logger.warning("Audio cache eviction failed", exc_info=True)
 
         return {
+            "source_id": synth["source_id"],
             "article_id": article.id,
             "audio_id": audio.id,
             "audio_path": audio.file_path,
@@ -263,5 +763,76 @@ def generate_latest_for_source(
             "word_count": word_count,
             "title": article.title,
             "url": article.url,
-            "scenes": scenes,  # helpful for next step (images/video)
+            "scenes": scenes or [],  # helpful for next step (images/video)
         }
+
+@celery_app.task(base=_StageTask, name="stage_fetch")
+def stage_fetch(state: dict) -> dict:
+    return _stage_fetch(state)
+
+@celery_app.task(base=_StageTask, name="stage_extract")
+def stage_extract(state: dict) -> dict:
+    return _stage_extract(state)
+
+@celery_app.task(base=_StageTask, name="stage_summarize")
+def stage_summarize(state: dict) -> dict:
+    return _stage_summarize(state)
+
+@celery_app.task(base=_StageTask, name="stage_storyboard")
+def stage_storyboard(state: dict) -> dict:
+    return _stage_storyboard(state)
+
+@celery_app.task(base=_StageTask, name="stage_restoryboard")
+def stage_restoryboard(states: list[dict]) -> list[dict]:
+    return _stage_restoryboard(states) if _storyboard_stale(states) else states
+
+@celery_app.task(base=_StageTask, name="stage_synthesize")
+def stage_synthesize(state: dict) -> dict:
+    return _stage_synthesize(state)
+
+@celery_app.task(base=_ProgressTask, name="stage_finalize")
+def stage_finalize(states: list[dict]) -> dict:
+    result = _stage_finalize(states)
+    runs.finish(runs.merge(states), result)
+    return result
+
+@celery_app.task(bind=True, base=_ProgressTask, name="generate_latest_for_source")
+def generate_latest_for_source(
+    self,
+    source_id: str,
+    voice_id: str | None = None,
+    target_seconds: int = TARGET_SECONDS,
+    n_scenes: int = 8,
+    force: bool = False,
+) -> dict:
+    """
+    All stages in one process (scripts, single-worker setups); the API queues generate_pipeline().
+    Each stage (text, script, storyboard, audio) reuses what the article already has,
+    unless `force` is set.
+    """
+    state = initial_state(self.request.id, source_id, voice_id, target_seconds, n_scenes, force)
+    try:
+        result = _run_in_process(state)
+    except Exception as e:
+        runs.finish(state, error=e)
+        raise
+    # the storyboard branch got a shallow copy, so its stage timing is already in state["run"]
+    runs.finish(state, result)
+    return result
+
+def _run_in_process(state: dict) -> dict:
+    state = _stage_summarize(_stage_extract(_stage_fetch(state)))
+    if state.get("result"):
+        return state["result"]
+
+    # storyboard doesn't depend on the audio: build it while ElevenLabs works
+    storyboard = _storyboard_pool.submit(_stage_storyboard, dict(state))
+    try:
+        synth = _stage_synthesize(state)
+    except Exception:
+        storyboard.cancel()
+        raise
+    states = [storyboard.result(), synth]
+    if _storyboard_stale(states):
+        states = _stage_restoryboard(states)
+    return _stage_finalize(states)
@@ -1,16 +1,38 @@
 import os
+import re
+import json
 import time
+import hashlib
+import shutil
+import tempfile
+import unicodedata
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional
 
 from elevenlabs import VoiceSettings
 from elevenlabs.client import ElevenLabs
 
-# One client per worker process (Celery-friendly)
+from app import ratelimit, runs
+from app.metrics import TTS_ATTEMPT_SECONDS, TTS_RETRIES, timer
+from app.mp3 import DurationCounter, concat_files
+
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
-if not ELEVENLABS_API_KEY:
-    raise RuntimeError("ELEVENLABS_API_KEY is not set")
+ELEVENLABS_BASE_URL = os.getenv("ELEVENLABS_BASE_URL") or None  # e.g. a local stand-in (bench/)
+
+# One client per worker process (Celery-friendly), created on first use
+_client: ElevenLabs | None = None
+_client_lock = threading.Lock()
 
-_client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
+def _get_client() -> ElevenLabs:
+    global _client
+    with _client_lock:
+        if _client is None:
+            if not ELEVENLABS_API_KEY:
+                raise RuntimeError("ELEVENLABS_API_KEY is not set")
+            _client = ElevenLabs(api_key=ELEVENLABS_API_KEY, base_url=ELEVENLABS_BASE_URL)
+        return _client
 
 # Multilingual v2 supports Spanish; language_code accepts 'es' among others.
 DEFAULT_LANGUAGE_CODE = os.getenv("ELEVENLABS_LANGUAGE_CODE", "es")
@@ -22,6 +44,14 @@ DEFAULT_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID")
 # Keep a safety cap (your ~3 min scripts should be well below this anyway)
 MAX_CHARS = int(os.getenv("ELEVENLABS_MAX_CHARS", "9000"))
 
+# Texts one request can't take are split at sentence boundaries and synthesized in parallel.
+# Defaults to MAX_CHARS: every split is a prosody seam and one more request against the rate limit.
+CHUNK_CHARS = min(int(os.getenv("ELEVENLABS_CHUNK_CHARS") or MAX_CHARS), MAX_CHARS)
+CHUNK_CONCURRENCY = int(os.getenv("ELEVENLABS_CHUNK_CONCURRENCY", "4"))
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s+")
+_CLAUSE_END_RE = re.compile(r"(?<=[,;:])\s+")
+
 def _default_voice_settings() -> VoiceSettings:
     # These map to ElevenLabs voice settings shown in their SDK examples.
     return VoiceSettings(
@@ -32,6 +62,79 @@ def _default_voice_settings() -> VoiceSettings:
         speed=float(os.getenv("ELEVENLABS_SPEED", "1.0")),  # keep fixed if you enforce exact duration later
     )
 
+class DurationExceeded(Exception):
+    """The stream was cut off because the audio already ran past max_seconds."""
+
+    def __init__(self, seconds: float, max_seconds: float):
+        super().__init__(f"Audio exceeded {max_seconds}s (cut off at {seconds:.1f}s)")
+        self.seconds = seconds
+        self.max_seconds = max_seconds
+
+class Cancelled(Exception):
+    """A sibling chunk failed or ran over; this one stopped early."""
+
+def split_for_tts(text: str, max_chars: int = CHUNK_CHARS) -> list[str]:
+    """Packs whole sentences into chunks of at most max_chars (clauses/words for run-ons)."""
+    pieces: list[str] = []
+    for sentence in _SENTENCE_END_RE.split(text.strip()):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        for clause in _CLAUSE_END_RE.split(sentence):
+            while len(clause) > max_chars:
+                cut = clause.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                pieces.append(clause[:cut])
+                clause = clause[cut:].lstrip()
+            pieces.append(clause)
+
+    chunks: list[str] = []
+    for piece in filter(None, pieces):
+        if chunks and len(chunks[-1]) + 1 + len(piece) <= max_chars:
+            chunks[-1] = f"{chunks[-1]} {piece}"
+        else:
+            chunks.append(piece)
+    return chunks
+
+def _check_request(text: str, voice_id: Optional[str]) -> str:
+    if not text or not text.strip():
+        raise ValueError("Empty text")
+    if len(text) > MAX_CHARS:
+        raise ValueError(f"Text too long for one request: {len(text)} chars (max {MAX_CHARS})")
+
+    vid = voice_id or DEFAULT_VOICE_ID
+    if not vid:
+        raise RuntimeError("ELEVENLABS_VOICE_ID is not set and no voice_id was provided")
+    return vid
+
+def render_key(
+    text: str,
+    voice_id: Optional[str] = None,
+    *,
+    voice_settings: Optional[VoiceSettings] = None,
+    language_code: Optional[str] = DEFAULT_LANGUAGE_CODE,
+    model_id: str = MODEL_ID,
+    output_format: str = OUTPUT_FORMAT,
+) -> str:
+    """
+    sha256 of everything that shapes the audio, resolved the same way synthesize() does.
+    Whitespace and Unicode form are normalized: they don't change what gets spoken.
+    """
+    vs = voice_settings or _default_voice_settings()
+    payload = json.dumps(
+        {
+            "text": " ".join(unicodedata.normalize("NFC", text).split()),
+            "voice_id": voice_id or DEFAULT_VOICE_ID,
+            "model_id": model_id,
+            "output_format": output_format,
+            "voice_settings": vs.model_dump(exclude_none=True),
+            "language_code": language_code,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 def synthesize(
     text: str,
     voice_id: Optional[str] = None,
@@ -42,41 +145,208 @@ def synthesize(
     model_id: str = MODEL_ID,
     output_format: str = OUTPUT_FORMAT,
 ) -> bytes:
-    if not text or not text.strip():
-        raise ValueError("Empty text")
-    if len(text) > MAX_CHARS:
-        raise ValueError(f"Text too long for one request: {len(text)} chars (max {MAX_CHARS})")
-
-    vid = voice_id or DEFAULT_VOICE_ID
-    if not vid:
-        raise RuntimeError("ELEVENLABS_VOICE_ID is not set and no voice_id was provided")
+    if len(text) > CHUNK_CHARS:
+        # chunked mode works on files; read the joined result back
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "audio.mp3")
+            synthesize_to_file(
+                text, path, voice_id, voice_settings=voice_settings, language_code=language_code,
+                retries=retries, model_id=model_id, output_format=output_format,
+            )
+            with open(path, "rb") as f:
+                return f.read()
 
+    vid = _check_request(text, voice_id)
     vs = voice_settings or _default_voice_settings()
 
     last_err: Exception | None = None
     for attempt in range(retries):
+        if attempt:
+            TTS_RETRIES.labels("request").inc()
+            runs.record(tts_retries=1)
+        runs.record(tts_requests=1, tts_characters=len(text))  # ElevenLabs bills every request
         try:
-            # convert returns an iterator of bytes in the SDK examples.
-            audio_stream = _client.text_to_speech.convert(
-                voice_id=vid,
-                model_id=model_id,
-                output_format=output_format,
-                text=text,
-                voice_settings=vs,
-                language_code=language_code,  # optional, but helpful for Spanish normalization
-            )
+            with ratelimit.slot("elevenlabs", model_id), timer(TTS_ATTEMPT_SECONDS, outcome="error") as labels:
+                # convert returns an iterator of bytes in the SDK examples.
+                audio_stream = _get_client().text_to_speech.convert(
+                    voice_id=vid,
+                    model_id=model_id,
+                    output_format=output_format,
+                    text=text,
+                    voice_settings=vs,
+                    language_code=language_code,  # optional, but helpful for Spanish normalization
+                )
 
-            chunks = []
-            for chunk in audio_stream:
-                if isinstance(chunk, (bytes, bytearray)) and chunk:
-                    chunks.append(bytes(chunk))
-            return b"".join(chunks)
+                chunks = []
+                for chunk in audio_stream:
+                    if isinstance(chunk, (bytes, bytearray)) and chunk:
+                        chunks.append(bytes(chunk))
+                labels["outcome"] = "ok"
+                return b"".join(chunks)
 
+        except ratelimit.RateLimitTimeout:
+            raise
         except Exception as e:
             last_err = e
             if attempt == retries - 1:
                 raise
-            time.sleep(0.8 * (2 ** attempt))  # simple backoff
+            if not ratelimit.is_rate_limited(e):  # after a 429 the limiter does the waiting
+                time.sleep(0.8 * (2 ** attempt))  # simple backoff
 
     # unreachable, but keeps type-checkers happy
     raise last_err or RuntimeError("TTS failed")
+
+def synthesize_to_file(
+    text: str,
+    path: str,
+    voice_id: Optional[str] = None,
+    *,
+    voice_settings: Optional[VoiceSettings] = None,
+    language_code: Optional[str] = DEFAULT_LANGUAGE_CODE,
+    retries: int = 3,
+    model_id: str = MODEL_ID,
+    output_format: str = OUTPUT_FORMAT,
+    max_seconds: Optional[float] = None,
+    previous_text: Optional[str] = None,
+    next_text: Optional[str] = None,
+    cancel: Optional[threading.Event] = None,
+) -> float:
+    """
+    Streaming variant of synthesize(): chunks go straight to `path` and the duration is
+    tracked from the MP3 frame headers as they arrive. Returns the duration in seconds.
+    Raises DurationExceeded as soon as the audio passes `max_seconds`; closing the stream
+    there means a rejected attempt doesn't wait for the rest of the synthesis.
+    Texts longer than CHUNK_CHARS are synthesized in parallel chunks and joined.
+    """
+    if len(text) > CHUNK_CHARS:
+        return _synthesize_chunked_to_file(
+            text, path, voice_id, voice_settings=voice_settings, language_code=language_code,
+            retries=retries, model_id=model_id, output_format=output_format, max_seconds=max_seconds,
+        )
+
+    vid = _check_request(text, voice_id)
+    vs = voice_settings or _default_voice_settings()
+
+    # neighbouring text keeps prosody continuous across chunk boundaries
+    context = {}
+    if previous_text:
+        context["previous_text"] = previous_text
+    if next_text:
+        context["next_text"] = next_text
+
+    last_err: Exception | None = None
+    for attempt in range(retries):
+        audio_stream = None
+        if cancel is not None and cancel.is_set():
+            raise Cancelled()
+        if attempt:
+            TTS_RETRIES.labels("request").inc()
+            runs.record(tts_retries=1)
+        runs.record(tts_requests=1, tts_characters=len(text))  # ElevenLabs bills every request
+        try:
+            # the slot is held until the stream ends: ElevenLabs counts open streams as concurrent requests
+            with (
+                ratelimit.slot("elevenlabs", model_id, cancel),
+                timer(TTS_ATTEMPT_SECONDS, outcome="error") as labels,
+            ):
+                if cancel is not None and cancel.is_set():  # set while we queued for the slot
+                    labels["outcome"] = "cancelled"
+                    raise Cancelled()
+                audio_stream = _get_client().text_to_speech.convert(
+                    voice_id=vid,
+                    model_id=model_id,
+                    output_format=output_format,
+                    text=text,
+                    voice_settings=vs,
+                    language_code=language_code,
+                    **context,
+                )
+
+                counter = DurationCounter()
+                with open(path, "wb") as f:  # "wb": a retry starts from an empty file
+                    for chunk in audio_stream:
+                        if not (isinstance(chunk, (bytes, bytearray)) and chunk):
+                            continue
+                        f.write(chunk)
+                        seconds = counter.feed(chunk)
+                        if max_seconds is not None and seconds > max_seconds:
+                            labels["outcome"] = "too_long"
+                            raise DurationExceeded(seconds, max_seconds)
+                        if cancel is not None and cancel.is_set():
+                            labels["outcome"] = "cancelled"
+                            raise Cancelled()
+                labels["outcome"] = "ok"
+                return counter.seconds
+
+        except (DurationExceeded, Cancelled, ratelimit.RateLimitTimeout):
+            raise
+        except Exception as e:
+            last_err = e
+            if attempt == retries - 1:
+                raise
+            if not ratelimit.is_rate_limited(e):  # after a 429 the limiter does the waiting
+                if cancel is not None:
+                    cancel.wait(0.8 * (2 ** attempt))
+                else:
+                    time.sleep(0.8 * (2 ** attempt))  # simple backoff
+        finally:
+            close = getattr(audio_stream, "close", None)
+            if close:
+                close()  # generator close -> the SDK closes the HTTP response
+
+    raise last_err or RuntimeError("TTS failed")
+
+def _synthesize_chunked_to_file(
+    text: str,
+    path: str,
+    voice_id: Optional[str],
+    *,
+    voice_settings: Optional[VoiceSettings],
+    language_code: Optional[str],
+    retries: int,
+    model_id: str,
+    output_format: str,
+    max_seconds: Optional[float],
+) -> float:
+    if not output_format.startswith("mp3"):
+        raise ValueError(f"Chunked synthesis needs an mp3 output format, got {output_format}")
+
+    chunks = split_for_tts(text)
+    cancel = threading.Event()
+    part_dir = tempfile.mkdtemp(prefix="tts-parts-", dir=os.path.dirname(path) or None)
+    part_paths = [os.path.join(part_dir, f"{i:04d}.mp3") for i in range(len(chunks))]
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(CHUNK_CONCURRENCY, len(chunks))))
+    try:
+        futures = [
+            pool.submit(
+                contextvars.copy_context().run,  # keeps the job's usage accounting (app.runs) in the threads
+                synthesize_to_file,
+                chunk,
+                part_paths[i],
+                voice_id,
+                voice_settings=voice_settings,
+                language_code=language_code,
+                retries=retries,
+                model_id=model_id,
+                output_format=output_format,
+                max_seconds=max_seconds,
+                previous_text=chunks[i - 1] if i > 0 else None,
+                next_text=chunks[i + 1] if i + 1 < len(chunks) else None,
+                cancel=cancel,
+            )
+            for i, chunk in enumerate(chunks)
+        ]
+        total = 0.0
+        for fut in as_completed(futures):
+            total += fut.result()
+            if max_seconds is not None and total > max_seconds:
+                raise DurationExceeded(total, max_seconds)
+
+        return concat_files(part_paths, path)
+    finally:
+        # every chunk is done on success; on failure stop the siblings at their next chunk or
+        # slot poll without waiting for them (one still streaming only finds its part file gone)
+        cancel.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+        shutil.rmtree(part_dir, ignore_errors=True)
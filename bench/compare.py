@@ -0,0 +1,70 @@
+"""
+Side-by-side view of two bench.run reports, e.g. before/after a change:
+
+    python -m bench.compare main.json branch.json --max-regression 10
+"""
+import sys
+import json
+import argparse
+
+# (label, getter, higher_is_better)
+METRICS = (
+    ("jobs/min/worker", lambda r: r["jobs_per_minute_per_worker"], True),
+    ("jobs/min", lambda r: r["jobs_per_minute"], True),
+    ("job p50 s", lambda r: r["job_seconds"].get("p50"), False),
+    ("job p95 s", lambda r: r["job_seconds"].get("p95"), False),
+    ("peak RSS MB", lambda r: r["peak_rss_mb"], False),
+)
+
+def _levels(report: dict) -> dict[int, dict]:
+    return {r["concurrency"]: r for r in report["levels"]}
+
+def _change(old, new) -> float | None:
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old * 100.0
+
+def compare(old: dict, new: dict) -> tuple[list[str], float]:
+    """Report lines and the worst throughput regression in percent (0 if none)."""
+    lines = [f"old {old.get('commit') or '?'}  ->  new {new.get('commit') or '?'}"]
+    worst = 0.0
+    a, b = _levels(old), _levels(new)
+    for c in sorted(a.keys() & b.keys()):
+        lines.append(f"\nconcurrency {c}")
+        rows = [(label, get(a[c]), get(b[c]), better) for label, get, better in METRICS]
+        stages = a[c]["stages"].keys() & b[c]["stages"].keys()
+        rows += [
+            (f"{s} p50 s", a[c]["stages"][s].get("p50"), b[c]["stages"][s].get("p50"), False) for s in sorted(stages)
+        ]
+        for label, x, y, better in rows:
+            pct = _change(x, y)
+            mark = ""
+            if pct is not None and abs(pct) >= 5:
+                mark = "  better" if (pct > 0) == better else "  worse"
+            shown = "" if pct is None else f"{pct:+.1f}%"
+            lines.append(f"  {label:<22} {x!s:>10} {y!s:>10} {shown:>8}{mark}")
+        pct = _change(a[c]["jobs_per_minute_per_worker"], b[c]["jobs_per_minute_per_worker"])
+        if pct is not None:
+            worst = max(worst, -pct)
+    return lines, worst
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.compare", description="Compare two bench.run reports")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--max-regression", type=float,
+                        help="exit 1 if jobs/min/worker drops by more than this many percent at any level")
+    args = parser.parse_args(argv)
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    lines, worst = compare(old, new)
+    print("\n".join(lines))
+    if args.max_regression is not None and worst > args.max_regression:
+        print(f"\nthroughput regressed {worst:.1f}% (limit {args.max_regression}%)", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Offline end-to-end benchmark of generate_latest_for_source.
+
+Feeds, article pages, OpenAI and ElevenLabs are served by local stand-ins (bench/stubs.py), so a
+run costs nothing. Each concurrency level starts that many worker processes (like a prefork
+Celery worker); every worker runs --jobs jobs against its own feed.
+
+    python -m bench.run --concurrency 1,2,4 --jobs 5 --out bench-results.json
+    python -m bench.compare old.json new.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import multiprocessing as mp
+from collections import defaultdict
+from dataclasses import asdict, fields
+
+from bench.stubs import StubConfig, StubStats, serve
+
+STAGES = ("_stage_fetch", "_stage_extract", "_stage_summarize", "_stage_storyboard", "_stage_synthesize", "_stage_finalize")
+
+def _summary(values: list[float]) -> dict:
+    if not values:
+        return {"n": 0}
+    ordered = sorted(values)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+    return {
+        "n": len(values),
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(pct(0.50), 4),
+        "p95": round(pct(0.95), 4),
+        "max": round(ordered[-1], 4),
+    }
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _worker(source_id: str, jobs: int, job_kwargs: dict, start, results) -> None:
+    # imported here: the parent has set the environment the app reads at import time
+    import app.tasks as tasks
+
+    timings: dict[str, list[float]] = defaultdict(list)
+
+    def timed(name, fn):
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timings[name.removeprefix("_stage_")].append(time.perf_counter() - t0)
+        return wrapper
+
+    # the runner looks stages up as module globals, so wrapping them here times the real code path
+    for name in STAGES:
+        setattr(tasks, name, timed(name, getattr(tasks, name)))
+
+    rss_after_import = _peak_rss_mb()
+    start.wait()
+
+    job_seconds, errors = [], []
+    t_start = time.perf_counter()
+    for _ in range(jobs):
+        t0 = time.perf_counter()
+        try:
+            result = tasks.generate_latest_for_source.run(source_id, **job_kwargs)
+            if result.get("reused"):
+                errors.append("reused: feed produced no new article")
+            else:
+                job_seconds.append(time.perf_counter() - t0)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+    wall = time.perf_counter() - t_start
+
+    results.put({
+        "source_id": source_id,
+        "ok": len(job_seconds),
+        "errors": errors,
+        "wall_seconds": wall,
+        "job_seconds": job_seconds,
+        "stages": dict(timings),
+        "rss_after_import_mb": rss_after_import,
+        "peak_rss_mb": _peak_rss_mb(),
+    })
+
+def _seed_sources(base_url: str, ids: list[str]) -> None:
+    from app.db import SessionLocal
+    from app.models import Source
+
+    with SessionLocal() as db:
+        for sid in ids:
+            db.add(Source(id=sid, name=sid, rss_url=f"{base_url}/feeds/{sid}.xml", language_hint="es"))
+        db.commit()
+
+def run_level(server, run_id: str, concurrency: int, jobs: int, job_kwargs: dict) -> dict:
+    ids = [f"bench-{run_id}-c{concurrency}-w{i}" for i in range(concurrency)]
+    _seed_sources(server.base_url, ids)
+    server.stats = StubStats()
+
+    ctx = mp.get_context("spawn")  # fresh interpreters: RSS is each worker's own, not the parent's
+    start = ctx.Barrier(concurrency + 1)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(sid, jobs, job_kwargs, start, results)) for sid in ids]
+    for p in procs:
+        p.start()
+    start.wait()  # every worker has imported the app
+    t0 = time.perf_counter()
+    workers = [results.get() for _ in procs]
+    wall = time.perf_counter() - t0
+    for p in procs:
+        p.join()
+
+    stages: dict[str, list[float]] = defaultdict(list)
+    for w in workers:
+        for name, values in w["stages"].items():
+            stages[name].extend(values)
+    ok = sum(w["ok"] for w in workers)
+    errors = [e for w in workers for e in w["errors"]]
+    per_worker = [w["ok"] / (w["wall_seconds"] / 60.0) for w in workers if w["wall_seconds"] > 0]
+
+    return {
+        "concurrency": concurrency,
+        "jobs": concurrency * jobs,
+        "ok": ok,
+        "failed": len(errors),
+        "errors": sorted(set(errors))[:10],
+        "wall_seconds": round(wall, 3),
+        "jobs_per_minute": round(ok / (wall / 60.0), 2) if wall > 0 else 0.0,
+        "jobs_per_minute_per_worker": round(sum(per_worker) / len(per_worker), 2) if per_worker else 0.0,
+        "job_seconds": _summary([s for w in workers for s in w["job_seconds"]]),
+        "stages": {name.removeprefix("_stage_"): _summary(stages[name.removeprefix("_stage_")]) for name in STAGES},
+        "peak_rss_mb": max(w["peak_rss_mb"] for w in workers),
+        "rss_after_import_mb": max(w["rss_after_import_mb"] for w in workers),
+        "stubs": server.stats.snapshot(),
+    }
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+def _environment(base_url: str, workdir: str, database_url: str | None) -> None:
+    # providers always point at the stand-ins: a benchmark must never spend real credits
+    os.environ.update(
+        OPENAI_API_KEY="bench",
+        OPENAI_BASE_URL=f"{base_url}/v1",
+        ELEVENLABS_API_KEY="bench",
+        ELEVENLABS_BASE_URL=base_url,
+    )
+    os.environ["DATABASE_URL"] = database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    defaults = {
+        "CELERY_BROKER_URL": "memory://",
+        "CELERY_RESULT_BACKEND": "cache+memory://",
+        "AUDIO_DIR": os.path.join(workdir, "audio"),
+        "ELEVENLABS_VOICE_ID": "bench-voice",
+        # caches would turn repeat runs into lookups; measure the work itself
+        "EXTRACT_CACHE_DIR": "",
+        "LLM_CACHE_BACKEND": "none",
+        # per-process limiter, loose enough not to be the bottleneck unless asked
+        "RATE_LIMIT_REDIS_URL": "",
+        "RATE_LIMIT_OPENAI_RPS": "1000",
+        "RATE_LIMIT_OPENAI_CONCURRENCY": "1000",
+        "RATE_LIMIT_ELEVENLABS_RPS": "1000",
+        "RATE_LIMIT_ELEVENLABS_CONCURRENCY": "1000",
+    }
+    for k, v in defaults.items():
+        os.environ.setdefault(k, v)
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.run", description="Offline pipeline benchmark")
+    parser.add_argument("--concurrency", default="1,2,4", help="comma-separated worker process counts")
+    parser.add_argument("--jobs", type=int, default=5, help="jobs per worker at each level")
+    parser.add_argument("--target-seconds", type=int, default=180)
+    parser.add_argument("--scenes", type=int, default=8)
+    parser.add_argument("--database-url", help="defaults to a throwaway SQLite file")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    for f in fields(StubConfig):
+        flag = "--" + f.name.replace("_", "-")
+        parser.add_argument(flag, type=int if f.name in ("feed_entries", "article_paragraphs", "seed") else float,
+                            default=f.default, dest=f.name)
+    args = parser.parse_args(argv)
+
+    config = StubConfig(**{f.name: getattr(args, f.name) for f in fields(StubConfig)})
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    server = serve(config)
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        _environment(server.base_url, workdir, args.database_url)
+        from app.db import init_db
+
+        init_db()
+        run_id = uuid.uuid4().hex[:8]
+        job_kwargs = {"target_seconds": args.target_seconds, "n_scenes": args.scenes}
+        results = []
+        for c in levels:
+            print(f"concurrency {c}: {c * args.jobs} jobs", file=sys.stderr)
+            results.append(run_level(server, run_id, c, args.jobs, job_kwargs))
+            r = results[-1]
+            print(
+                f"  {r['jobs_per_minute']} jobs/min, {r['jobs_per_minute_per_worker']} per worker, "
+                f"p50 job {r['job_seconds'].get('p50')}s, peak RSS {r['peak_rss_mb']} MB, {r['failed']} failed",
+                file=sys.stderr,
+            )
+    server.shutdown()
+
+    report = {
+        "commit": _git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "jobs_per_worker": args.jobs,
+        "target_seconds": args.target_seconds,
+        "stubs": asdict(config),
+        "levels": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+import re
+import sys
+import json
+import time
+import random
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# 128 kbps / 44.1 kHz MPEG-1 layer III frame: 417 bytes, 1152 samples (~26 ms)
+FRAME = b"\xff\xfb\x90\x00" + b"\x00" * 413
+FRAME_SECONDS = 1152 / 44100
+
+_WORDS = (
+    "salud pacientes estudio tratamiento riesgo hospital datos resultados medicamento dosis "
+    "investigadores ensayo clinico sintomas vacuna prevencion diagnostico terapia efecto casos"
+).split()
+
+_TARGET_RE = re.compile(r"target(?: word count)?:?\s*(\d+)", re.IGNORECASE)
+_SCENES_RE = re.compile(r"Create (\d+) scenes")
+
+@dataclass
+class StubConfig:
+    """Latency (seconds) and failure rates (0-1) of the stand-ins."""
+    http_latency: float = 0.02       # feeds and article pages
+    llm_latency: float = 0.5         # per Responses call
+    tts_latency: float = 0.3         # time to first audio byte
+    tts_realtime: float = 0.02       # wall seconds per second of audio streamed
+    tts_wpm: float = 140.0
+    llm_fail_rate: float = 0.0       # 500s
+    tts_fail_rate: float = 0.0
+    llm_throttle_rate: float = 0.0   # 429s with Retry-After
+    tts_throttle_rate: float = 0.0
+    retry_after: float = 1.0
+    feed_entries: int = 10
+    article_paragraphs: int = 12
+    seed: int | None = None
+
+@dataclass
+class StubStats:
+    requests: dict[str, int] = field(default_factory=dict)
+    injected: dict[str, int] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def count(self, kind: str, injected: str | None = None) -> None:
+        with self.lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+            if injected:
+                key = f"{kind}_{injected}"
+                self.injected[key] = self.injected.get(key, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {"requests": dict(self.requests), "injected_failures": dict(self.injected)}
+
+def _sentences(rng: random.Random, words: int) -> str:
+    out, n = [], 0
+    while n < words:
+        k = min(rng.randint(8, 16), words - n)
+        sentence = " ".join(rng.choice(_WORDS) for _ in range(k))
+        out.append(sentence[:1].upper() + sentence[1:] + ".")
+        n += k
+    return " ".join(out)
+
+def fake_llm_text(system: str, user: str, rng: random.Random) -> str:
+    """Script, rewrite or storyboard, shaped like what summarize.py asks for."""
+    scenes = _SCENES_RE.search(user)
+    if scenes:
+        n = int(scenes.group(1))
+        return json.dumps([
+            {"scene": i + 1, "narration": _sentences(rng, 12), "image_prompt": "hospital corridor, soft light"}
+            for i in range(n)
+        ])
+    m = _TARGET_RE.search(user)
+    target = int(m.group(1)) if m else 400
+    # a little off target, like a real model; randomness keeps scripts (and TTS cache keys) unique
+    words = max(20, int(target * rng.uniform(0.95, 1.05)) - 5)
+    return _sentences(rng, words) + " Esto no es consejo medico, consulte a profesionales de la salud."
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "StubServer"
+
+    def log_message(self, *args):  # keep benchmark output clean
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _fail(self, kind: str, fail_rate: float, throttle_rate: float) -> bool:
+        cfg, rng = self.server.config, self.server.rng()
+        roll = rng.random()
+        if roll < throttle_rate:
+            self.server.stats.count(kind, "429")
+            body = json.dumps({"error": {"message": "rate limited", "type": "rate_limit_exceeded"}}).encode()
+            self._send(429, body, "application/json", {"Retry-After": f"{cfg.retry_after:g}"})
+            return True
+        if roll < throttle_rate + fail_rate:
+            self.server.stats.count(kind, "500")
+            self._send(500, b'{"error": {"message": "injected failure"}}', "application/json")
+            return True
+        return False
+
+    def _body(self) -> dict:
+        n = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(n) or b"{}")
+
+    def do_GET(self):
+        cfg = self.server.config
+        path = urlparse(self.path).path
+        time.sleep(cfg.http_latency)
+        m = re.fullmatch(r"/feeds/([\w-]+)\.xml", path)
+        if m:
+            self.server.stats.count("feed")
+            return self._send(200, self.server.feed(m.group(1)), "application/rss+xml")
+        m = re.fullmatch(r"/articles/([\w-]+)/(\d+)\.html", path)
+        if m:
+            self.server.stats.count("article")
+            return self._send(200, self.server.article(m.group(1), int(m.group(2))), "text/html; charset=utf-8")
+        self._send(404, b"not found", "text/plain")
+
+    def do_POST(self):
+        cfg = self.server.config
+        path = urlparse(self.path).path
+        if path == "/v1/responses":
+            return self._responses(cfg)
+        if path.startswith("/v1/text-to-speech/"):
+            return self._tts(cfg)
+        self._send(404, b"not found", "text/plain")
+
+    def _responses(self, cfg: StubConfig) -> None:
+        req = self._body()
+        time.sleep(cfg.llm_latency * self.server.rng().uniform(0.8, 1.2))
+        if self._fail("llm", cfg.llm_fail_rate, cfg.llm_throttle_rate):
+            return
+        self.server.stats.count("llm")
+        messages = req.get("input") or []
+        system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        user = next((m["content"] for m in messages if m.get("role") == "user"), "")
+        text = fake_llm_text(system, user, self.server.rng())
+        body = {
+            "id": f"resp_{time.time_ns()}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": req.get("model", "stub"),
+            "status": "completed",
+            "output": [{
+                "id": f"msg_{time.time_ns()}",
+                "type": "message",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }],
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": (len(system) + len(user)) // 4,
+                "output_tokens": len(text) // 4,
+                "total_tokens": (len(system) + len(user) + len(text)) // 4,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens_details": {"reasoning_tokens": 0},
+            },
+        }
+        self._send(200, json.dumps(body).encode(), "application/json")
+
+    def _tts(self, cfg: StubConfig) -> None:
+        req = self._body()
+        time.sleep(cfg.tts_latency)
+        if self._fail("tts", cfg.tts_fail_rate, cfg.tts_throttle_rate):
+            return
+        self.server.stats.count("tts")
+        seconds = len((req.get("text") or "").split()) / cfg.tts_wpm * 60.0
+        frames = max(1, int(seconds / FRAME_SECONDS))
+
+        # chunked, paced like a real-time-ish synthesizer
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        per_chunk = 40  # ~1 s of audio per chunk
+        for start in range(0, frames, per_chunk):
+            n = min(per_chunk, frames - start)
+            if cfg.tts_realtime:
+                time.sleep(n * FRAME_SECONDS * cfg.tts_realtime)
+            data = FRAME * n
+            try:
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                return  # client stopped reading (duration cap / cancel)
+        self.wfile.write(b"0\r\n\r\n")
+
+class StubServer(ThreadingHTTPServer):
+    """
+    RSS feeds, article pages, OpenAI Responses and ElevenLabs TTS on one local port.
+    Every feed request publishes a new newest entry, so each job finds a fresh article.
+    """
+    daemon_threads = True
+
+    def __init__(self, config: StubConfig, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.config = config
+        self.stats = StubStats()
+        self._counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._seed = random.Random(config.seed)
+        self._local = threading.local()
+
+    def handle_error(self, request, client_address):
+        # clients closing a stream early (duration cap, cancel) are expected, not worth a traceback
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def rng(self) -> random.Random:
+        rng = getattr(self._local, "rng", None)
+        if rng is None:
+            with self._lock:
+                rng = self._local.rng = random.Random(self._seed.random())
+        return rng
+
+    def feed(self, feed_id: str) -> bytes:
+        with self._lock:
+            newest = self._counters[feed_id] = self._counters.get(feed_id, 0) + 1
+        now = datetime.now(timezone.utc)
+        items = []
+        for i in range(newest, max(0, newest - self.config.feed_entries), -1):
+            published = format_datetime(now - timedelta(minutes=newest - i))
+            items.append(
+                f"<item><title>Bench article {feed_id} #{i}</title>"
+                f"<link>{self.base_url}/articles/{feed_id}/{i}.html</link>"
+                f"<description>Resumen del articulo {i}.</description>"
+                f"<pubDate>{published}</pubDate></item>"
+            )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f"<title>bench {feed_id}</title><link>{self.base_url}</link><description>bench</description>"
+            + "".join(items) + "</channel></rss>"
+        ).encode()
+
+    def article(self, feed_id: str, n: int) -> bytes:
+        rng = random.Random(f"{feed_id}/{n}")
+        paragraphs = "".join(f"<p>{_sentences(rng, 60)}</p>" for _ in range(self.config.article_paragraphs))
+        return (
+            f"<!doctype html><html><head><title>Bench article {feed_id} #{n}</title></head><body>"
+            "<nav><a href='/'>Inicio</a> | <a href='/salud'>Salud</a></nav>"
+            f"<article><h1>Bench article {feed_id} #{n}</h1>{paragraphs}</article>"
+            "<footer>Copyright bench</footer></body></html>"
+        ).encode()
+
+def serve(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> StubServer:
+    """Starts the stand-ins on a background thread; call .shutdown() when done."""
+    server = StubServer(config, host, port)
+    threading.Thread(target=server.serve_forever, name="bench-stubs", daemon=True).start()
+    return server